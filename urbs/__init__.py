@@ -11,15 +11,19 @@ commodities.
 """
 
 from .data import COLORS
-from .models import urbsType, Normal, DivideTimestepsMaster, DivideTimestepsSub, RegionalMaster, RegionalSub, SddpMaster, SddpSub
-from .input import read_excel, get_input
+from .models import urbsType, CutPool, TrustRegion, Normal, NormalMatrix, DivideTimestepsMaster, DivideTimestepsSub, RegionalMaster, RegionalSub, SddpMaster, SddpSub
+from .input import read_excel, get_input, PreparedInput
+from .scenario_tree import ScenarioTree
 from .output import get_constants, get_timeseries, append_df_to_excel, prepare_result_directory, plot_convergence, create_benders_output_table, create_benders_output_table_sddp, update_benders_output_table, update_benders_output_table_sddp, create_tracking_file, update_tracking_file, TerminalAndFileWriter
 from .plot import plot, result_figures, to_color
 from .pyomoio import get_entity, get_entities, list_entities
 from .report import report
-from .saveload import load, save
+from .saveload import load, load_many, parse_result_name, save, read_entity, ResultContainer, LazyNodes
 from .benders import *
+from .policy_evaluation import PolicyEvaluation, evaluate_policy
+from .catalog import update_catalog, read_catalog
 from .validation import validate_input
+from .tracing import start_tracing, stop_tracing, set_iteration, span, traced, read_trace, summarize_trace
 from .scenarios import *
 
 
@@ -1,3 +1,6 @@
+import math
+import time
+
 import pyomo.core as pyomo
 
 
@@ -70,6 +73,10 @@ def convergence_check(master, subs, upper_bound, costs, decomposition_method):
         costs: extra costs calculated by get_production_cost()
         decomposition_method: The decomposition method which is used. Must be in ['divide-timesteps', 'regional', 'sddp']
 
+    If the master has a trust_region (see models.stabilization.TrustRegion),
+    the lower bound is the best valid one and the trust region is moved
+    according to the new upper bound.
+
     Returns:
         GAP = Dual Gap of the Bender's Decomposition
         Zdo = Lower Bound
@@ -95,8 +102,181 @@ def convergence_check(master, subs, upper_bound, costs, decomposition_method):
     else:
         raise Exception('Invalid decomposition Method')
 
+    if master.trust_region is not None:
+        lower_bound = master.trust_region.valid_lower_bound(master)
+        # the costs of relaxed subs (Lambda > 0) are no upper bound
+        if any(subs[inst].Lambda() > 0.000001 for inst in subs):
+            master.trust_region.update(master, float('inf'))
+        else:
+            master.trust_region.update(master, new_upper_bound)
+
     upper_bound = min(upper_bound, new_upper_bound)
     gap = upper_bound - lower_bound
 
     return gap, lower_bound, upper_bound
 
+
+
+class ConvergenceController(object):
+    """Decides when to stop the Benders loop of any decomposition method.
+
+    The loop stops as soon as one of the configured criteria holds:
+
+    - the gap upper_bound - lower_bound is at most absolute_gap;
+    - the relative gap, i.e. the gap divided by |upper_bound|, is at most
+      relative_gap;
+    - for SDDP, the lower bound lies in the confidence interval of a valid
+      PolicyEvaluation passed to update (see PolicyEvaluation.status);
+    - neither bound improved by more than stall_tolerance (relative) in the
+      last stall_iterations iterations;
+    - max_iterations iterations were done or time_limit seconds have passed
+      since the controller was created (or reset);
+    - a callback returned True.
+
+    The lower bound passed to update must be a valid lower bound, i.e. the
+    master objective, or TrustRegion.valid_lower_bound with a trust region
+    (convergence_check returns it). For divide-timesteps and regional, the
+    upper bound of convergence_check is the cost of a feasible solution,
+    so the best one of all iterations is used. For SDDP, the upper bound of
+    a forward pass is the cost of a sampled path; the minimum of such
+    samples is biased low and would stop the training too early. With
+    stochastic_upper_bound, the sampled upper bounds are only recorded; the
+    gaps are taken to the upper end of the confidence interval of the last
+    PolicyEvaluation passed to update (which stays an upper bound, as every
+    policy costs at least the optimum) and stall detection only regards the
+    lower bound.
+
+    Each callback is called as callback(controller, record) after every
+    iteration, e.g. for logging or a custom criterion. Every iteration is
+    recorded in history (see history_frame), together with the reason of the
+    stop in reason.
+
+    Example:
+        >>> controller = ConvergenceController(relative_gap=1e-4, stall_iterations=20, time_limit=3600)
+        >>> upper_bound = float('inf')
+        >>> while True:
+        >>>     master.solve(optim)
+        >>>     ...  # solve the subs
+        >>>     gap, lower_bound, upper_bound = convergence_check(master, subs, upper_bound, 0, method)
+        >>>     if controller.update(lower_bound, upper_bound):
+        >>>         break
+        >>>     master.add_cuts(subs.values())
+        >>> print(controller.reason)
+
+        SDDP, evaluating the policy every 10th iteration:
+
+        >>> controller = ConvergenceController(relative_gap=1e-3, stochastic_upper_bound=True)
+        >>>     ...  # forward and backward pass
+        >>>     evaluation = None
+        >>>     if i % 10 == 0:
+        >>>         evaluation = evaluate_policy(master, stages, probabilities, boundaries, 'gurobi')
+        >>>     if controller.update(master.obj(), forward_pass_costs, evaluation):
+        >>>         break
+    """
+    def __init__(self, relative_gap=None, absolute_gap=None, max_iterations=None, time_limit=None,
+                 stall_iterations=None, stall_tolerance=1e-6, callbacks=None, stochastic_upper_bound=False):
+        """Initializes the controller; criteria which are None are not checked.
+
+        Args:
+            relative_gap: tolerance of the gap relative to |upper_bound|
+            absolute_gap: tolerance of the gap
+            max_iterations: maximal number of iterations
+            time_limit: maximal wall-clock time in seconds
+            stall_iterations: number of iterations without improvement of the bounds after which to stop
+            stall_tolerance: minimal relative improvement of a bound which counts in stall detection
+            callbacks: optional list of functions callback(controller, record); the loop stops if one returns True
+            stochastic_upper_bound: set True if the upper bounds are sampled costs, as in SDDP
+        """
+        self.relative_gap = relative_gap
+        self.absolute_gap = absolute_gap
+        self.max_iterations = max_iterations
+        self.time_limit = time_limit
+        self.stall_iterations = stall_iterations
+        self.stall_tolerance = stall_tolerance
+        self.callbacks = list(callbacks or [])
+        self.stochastic_upper_bound = stochastic_upper_bound
+        self.reset()
+
+    def reset(self):
+        """Clears the history and restarts the clock."""
+        self.start_time = time.time()
+        self.history = []
+        self.reason = None
+        self.best_lower_bound = -float('inf')
+        self.best_upper_bound = float('inf')
+        self.evaluation = None
+        self._last_improvement = 0
+
+    def update(self, lower_bound, upper_bound, evaluation=None, **values):
+        """Records an iteration and checks the criteria.
+
+        Args:
+            lower_bound: valid lower bound of the iteration
+            upper_bound: upper bound of the iteration; the sampled cost of a
+                forward pass with stochastic_upper_bound
+            evaluation: optional PolicyEvaluation of an SDDP policy
+            values: further values recorded in the history, e.g. master_objective
+
+        Returns:
+            True if the loop should stop; the reason is in self.reason
+        """
+        iteration = len(self.history) + 1
+        if evaluation is not None:
+            self.evaluation = evaluation
+        improved = self._improves(lower_bound, self.best_lower_bound)
+        if not self.stochastic_upper_bound:
+            improved = improved or self._improves(-upper_bound, -self.best_upper_bound)
+            self.best_upper_bound = min(self.best_upper_bound, upper_bound)
+        elif self.evaluation is not None and self.evaluation.infeasible == 0:
+            self.best_upper_bound = self.evaluation.upper
+        if improved:
+            self._last_improvement = iteration
+        self.best_lower_bound = max(self.best_lower_bound, lower_bound)
+
+        gap = self.best_upper_bound - self.best_lower_bound
+        if math.isinf(self.best_upper_bound):
+            relative_gap = float('inf')
+        else:
+            relative_gap = gap / max(abs(self.best_upper_bound), 1e-10)
+        record = {'iteration': iteration,
+                  'time': time.time() - self.start_time,
+                  'lower_bound': lower_bound,
+                  'upper_bound': upper_bound,
+                  'gap': gap,
+                  'relative_gap': relative_gap}
+        if evaluation is not None:
+            record['evaluation_lower'] = evaluation.lower
+            record['evaluation_upper'] = evaluation.upper
+            record['evaluation_status'] = evaluation.status(self.best_lower_bound)
+        record.update(values)
+
+        self.reason = None
+        if self.absolute_gap is not None and gap <= self.absolute_gap:
+            self.reason = 'absolute gap'
+        elif self.relative_gap is not None and relative_gap <= self.relative_gap:
+            self.reason = 'relative gap'
+        elif evaluation is not None and evaluation.converged(self.best_lower_bound):
+            self.reason = 'confidence interval'
+        elif self.stall_iterations is not None and iteration - self._last_improvement >= self.stall_iterations:
+            self.reason = 'stall'
+        elif self.max_iterations is not None and iteration >= self.max_iterations:
+            self.reason = 'iterations'
+        elif self.time_limit is not None and record['time'] >= self.time_limit:
+            self.reason = 'time limit'
+        for callback in self.callbacks:
+            if callback(self, record) and self.reason is None:
+                self.reason = 'callback'
+        record['stop'] = self.reason
+        self.history.append(record)
+        return self.reason is not None
+
+    def history_frame(self):
+        """Returns the history as DataFrame with one row per iteration."""
+        import pandas as pd
+        return pd.DataFrame(self.history).set_index('iteration') if self.history else pd.DataFrame()
+
+    def _improves(self, new, best):
+        """ Return True if new is larger than best by more than the relative stall tolerance """
+        if math.isinf(best):
+            return not math.isinf(new)
+        return new > best + self.stall_tolerance * max(1, abs(best))
@@ -0,0 +1,203 @@
+import glob
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+from .saveload import (load, parse_result_name, _read_manifest,
+                       _COLUMNAR_FORMATS, _MANIFEST)
+
+CATALOG_FILE = 'catalog.sqlite'
+
+
+def update_catalog(folder, catalog_file=None):
+    """Create or update the catalog of all result files in a folder.
+
+    The catalog is a SQLite database with two tables: 'files' lists every
+    result file (HDF5 store or Parquet/Feather result directory) with the
+    scenario, model type, sub index, realization and iteration parsed from
+    its name (see saveload.parse_result_name) and its objective value;
+    'entities' lists the shape of every input sheet and result entity per
+    file. Only files that are new or were modified since the last update
+    are opened; files that no longer exist are removed from the catalog.
+
+    Args:
+        folder: directory containing the result files
+        catalog_file: optional catalog path; default: catalog.sqlite in
+                      folder
+
+    Returns:
+        DataFrame of the 'files' table, see read_catalog
+    """
+    if catalog_file is None:
+        catalog_file = os.path.join(folder, CATALOG_FILE)
+
+    connection = sqlite3.connect(catalog_file)
+    with closing(connection), connection:
+        connection.execute('CREATE TABLE IF NOT EXISTS files ('
+                           'path TEXT PRIMARY KEY, mtime REAL, size INTEGER, '
+                           'scenario TEXT, model_type TEXT, sub INTEGER, '
+                           'realization TEXT, iteration, objective REAL)')
+        connection.execute('CREATE TABLE IF NOT EXISTS entities ('
+                           'path TEXT, "group" TEXT, name TEXT, '
+                           'rows INTEGER, columns INTEGER, '
+                           'PRIMARY KEY (path, "group", name))')
+
+        known = {path: (mtime, size) for path, mtime, size in
+                 connection.execute('SELECT path, mtime, size FROM files')}
+        paths = _glob_results(folder)
+        for path in set(known) - set(paths):
+            _remove(connection, path)
+
+        for path in paths:
+            stamp = _stamp(os.path.join(folder, path))
+            if known.get(path) == stamp:
+                continue
+            _remove(connection, path)
+            _insert(connection, folder, path, stamp)
+
+    return read_catalog(folder, catalog_file)
+
+
+def read_catalog(folder, catalog_file=None, entities=False):
+    """Read the catalog of a result folder written by update_catalog.
+
+    Args:
+        folder: directory containing the result files
+        catalog_file: optional catalog path; default: catalog.sqlite in
+                      folder
+        entities: if True, return the 'entities' table instead
+
+    Returns:
+        DataFrame of the 'files' table indexed by path, or of the 'entities'
+        table indexed by (path, group, name)
+
+    Example:
+        >>> catalog = read_catalog('h5_files')
+        >>> catalog[catalog.model_type == 'master'].iteration.max()
+    """
+    if catalog_file is None:
+        catalog_file = os.path.join(folder, CATALOG_FILE)
+
+    with closing(sqlite3.connect(catalog_file)) as connection:
+        if entities:
+            return pd.read_sql('SELECT * FROM entities', connection,
+                               index_col=['path', 'group', 'name'])
+        return pd.read_sql('SELECT scenario, model_type, sub, realization, '
+                           'iteration, objective, path FROM files',
+                           connection, index_col='path')
+
+
+def _glob_results(folder):
+    """ Return result file and directory names in folder, sorted """
+    names = [os.path.basename(path)
+             for path in glob.glob(os.path.join(folder, '*.h5'))]
+    names.extend(os.path.basename(os.path.dirname(path)) for path in
+                 glob.glob(os.path.join(folder, '*', _MANIFEST)))
+    return sorted(names)
+
+
+def _stamp(path):
+    """ Return (modification time, size) of a result file or directory """
+    if os.path.isdir(path):
+        path = os.path.join(path, _MANIFEST)
+    status = os.stat(path)
+    return status.st_mtime, status.st_size
+
+
+def _remove(connection, path):
+    """ Remove a result file from the catalog """
+    connection.execute('DELETE FROM files WHERE path = ?', (path,))
+    connection.execute('DELETE FROM entities WHERE path = ?', (path,))
+
+
+def _insert(connection, folder, path, stamp):
+    """ Add a result file with its entity shapes to the catalog """
+    scenario, sub, realization, iteration = parse_result_name(path)
+    if isinstance(sub, str):
+        model_type, sub = sub, None
+    elif sub is not None:
+        model_type = 'sub'
+    else:
+        model_type = None
+
+    filename = os.path.join(folder, path)
+    shapes = _shapes(filename)
+    objective = _objective(filename, shapes)
+
+    connection.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                       (path, stamp[0], stamp[1], scenario, model_type, sub,
+                        realization, iteration, objective))
+    connection.executemany('INSERT INTO entities VALUES (?, ?, ?, ?, ?)',
+                           [(path, group, name, rows, columns)
+                            for (group, name), (rows, columns)
+                            in shapes.items()])
+
+
+def _objective(filename, shapes):
+    """ Return the objective value of a result file.
+
+    Sub problems minimize Lambda; normal and master problems the sum of
+    costs (including the future costs of master problems).
+
+    Args:
+        filename: result file or directory
+        shapes: dict of entity shapes, as returned by _shapes
+
+    Returns:
+        objective value or None if neither Lambda nor costs are stored
+    """
+    for name in ['Lambda', 'costs']:
+        if ('result', name) in shapes:
+            value = load(filename, entities=[name])._result[name]
+            return float(value.sum())
+    return None
+
+
+def _shapes(filename):
+    """ Return the shapes of all frames of a result file without reading them.
+
+    Args:
+        filename: result file or directory
+
+    Returns:
+        dict {(group, name): (rows, columns)}; columns is None for Series,
+        rows is None for pickled frames of result directories
+    """
+    shapes = {}
+    if os.path.isdir(filename):
+        import pyarrow.dataset as ds
+        manifest = _read_manifest(filename)
+        for group in ['data', 'result']:
+            for name, entry in manifest[group].items():
+                columns = None if entry['series'] else len(entry['columns'])
+                path = os.path.join(filename, entry['file'])
+                rows = None
+                for file_format, suffix in _COLUMNAR_FORMATS.items():
+                    if path.endswith(suffix):
+                        rows = ds.dataset(path, format='ipc'
+                                          if file_format == 'feather'
+                                          else file_format).count_rows()
+                shapes[group, name] = rows, columns
+        return shapes
+
+    with pd.HDFStore(filename, mode='r') as store:
+        for group in ['data', 'result']:
+            for node in store.get_node(group):
+                storer = store.get_storer(node._v_pathname)
+                attrs = storer.attrs
+                if storer.is_table:
+                    rows = int(storer.nrows)
+                    columns = (len(attrs.non_index_axes[0][1]) -
+                               len(getattr(attrs, 'urbs_index', [])))
+                    if getattr(attrs, 'urbs_series', False):
+                        columns = None
+                else:
+                    shape = storer.shape
+                    if shape is None:
+                        # e.g. frames with MultiIndex columns
+                        shape = store[node._v_pathname].shape
+                    rows = int(shape[0]) if len(shape) > 0 else 0
+                    columns = int(shape[1]) if len(shape) > 1 else None
+                shapes[group, node._v_name] = rows, columns
+    return shapes
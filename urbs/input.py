@@ -1,3 +1,4 @@
+import copy
 import pyomo.core as pyomo
 from urbs.modelhelper import *
 
@@ -88,6 +89,147 @@ def read_excel(filename):
     return data
 
 
+class PreparedInput(object):
+    """Preprocessed model input, shared by all problems built from it.
+
+    Holds the input frames of one model window (all sites or a single site
+    for regional sub problems) together with everything derived from them
+    when a model is created: annuity factors, the dicts of commodity,
+    demand, supim, process, transmission and storage, the process
+    input/output ratios and their minimum fractions. Passing one instance
+    instead of the read_excel dict to many sub problems (or worker
+    processes) does this preprocessing only once; sub problems then only
+    select their time steps. Instances are treated as read-only.
+
+    Example:
+        >>> prepared = PreparedInput(read_excel('mimo-example.xlsx'))
+        >>> subs = [DivideTimestepsSub(prepared, range(t, t + 25))
+        ...         for t in range(0, 8760, 24)]
+    """
+    def __init__(self, data, site=None):
+        """Prepares the input of all sites or of one site.
+
+        Args:
+            data: a dict of DataFrames as returned by read_excel
+            site: optional site to restrict the input to (regional sub
+                problems); all sites if None
+        """
+        self.data = data
+        self.site_name = site
+        self._sites = {}
+
+        self.global_prop = data['global_prop'].drop('description', axis=1)
+        self.process_commodity = data['process_commodity']
+        if site is not None:
+            self.site = data['site'].loc[[site]]
+            self.commodity = data['commodity'].loc[[site]]
+            self.process = data['process'].loc[[site]]
+            self.transmission = data['transmission'].loc[
+                (data['transmission'].index.get_level_values('Site In') == site) |
+                (data['transmission'].index.get_level_values('Site Out') == site)]
+            self.storage = data['storage'].loc[[site]]
+            self.demand = data['demand'][[site]]
+            self.supim = data['supim'][[site]]
+        else:
+            self.site = data['site']
+            self.commodity = data['commodity']
+            self.process = data['process']
+            self.transmission = data['transmission']
+            self.storage = data['storage']
+            self.demand = data['demand']
+            self.supim = data['supim']
+
+        # Converting Data frames to dict
+        self.commodity_dict = self.commodity.to_dict()
+        self.demand_dict = self.demand.to_dict()
+        self.supim_dict = self.supim.to_dict()
+
+        # process input/output ratios
+        self.r_in = self.process_commodity.xs('In', level='Direction')['ratio']
+        self.r_out = self.process_commodity.xs('Out', level='Direction')['ratio']
+        self.r_in_dict = self.r_in.to_dict()
+        self.r_out_dict = self.r_out.to_dict()
+
+        # process areas
+        self.proc_area = self.process['area-per-cap']
+        self.sit_area = self.site['area']
+        self.proc_area = self.proc_area[self.proc_area >= 0]
+        self.sit_area = self.sit_area[self.sit_area >= 0]
+
+        # input ratios for partial efficiencies
+        # only keep those entries whose values are
+        # a) positive and
+        # b) numeric (implicitely, as NaN or NV compare false against 0)
+        self.r_in_min_fraction = self.process_commodity.xs('In', level='Direction')
+        self.r_in_min_fraction = self.r_in_min_fraction['ratio-min']
+        self.r_in_min_fraction = self.r_in_min_fraction[self.r_in_min_fraction > 0]
+
+        # output ratios for partial efficiencies
+        # only keep those entries whose values are
+        # a) positive and
+        # b) numeric (implicitely, as NaN or NV compare false against 0)
+        self.r_out_min_fraction = self.process_commodity.xs('Out', level='Direction')
+        self.r_out_min_fraction = self.r_out_min_fraction['ratio-min']
+        self.r_out_min_fraction = self.r_out_min_fraction[self.r_out_min_fraction > 0]
+
+        # derive annuity factor from WACC and depreciation duration
+        pd.set_option('mode.chained_assignment', None)  # Remove SettingWithCopyError Warning
+        self.process['annuity-factor'] = annuity_factor(
+            self.process['depreciation'],
+            self.process['wacc'])
+        self.transmission['annuity-factor'] = annuity_factor(
+            self.transmission['depreciation'],
+            self.transmission['wacc'])
+        self.storage['annuity-factor'] = annuity_factor(
+            self.storage['depreciation'],
+            self.storage['wacc'])
+
+        # Converting Data frames to dictionaries
+        self.process_dict = self.process.to_dict()
+        self.transmission_dict = self.transmission.to_dict()
+        self.storage_dict = self.storage.to_dict()
+
+    def __getitem__(self, name):
+        """Return the input DataFrame name, as from the read_excel dict."""
+        return self.data[name]
+
+    def for_site(self, site):
+        """Return the prepared input of a single site, built once per site.
+
+        Args:
+            site: site name
+
+        Returns:
+            a PreparedInput restricted to site
+        """
+        if self.site_name is not None:
+            raise ValueError('Input is already restricted to a site.')
+        if site not in self._sites:
+            self._sites[site] = PreparedInput(self.data, site)
+        return self._sites[site]
+
+    def with_supim(self, supim):
+        """Return a copy with modified supim timeseries.
+
+        All other prepared members are shared with this instance.
+
+        Args:
+            supim: DataFrame replacing the 'supim' input of all sites
+
+        Returns:
+            a PreparedInput using supim
+        """
+        prepared = copy.copy(self)
+        prepared.data = dict(self.data)
+        prepared.data['supim'] = supim
+        prepared._sites = {}
+        if self.site_name is not None:
+            supim = supim[[self.site_name]]
+        prepared.supim = supim
+        prepared.supim_dict = supim.to_dict()
+        return prepared
+
+
 def split_columns(columns, sep='.'):
     """Split columns by separator into MultiIndex.
 
@@ -31,6 +31,10 @@ def commodity_balance(m, tm, sit, com):
     (from process/storage/transmission, counts negative) power. Used as helper
     function in create_model for constraints on demand and stock commodities.
 
+    The tuples adjacent to (sit, com) are looked up in m.balance_index (see
+    commodity_balance_index), so that the cost of one call does not depend on
+    the total number of process, transmission and storage tuples.
+
     Args:
         m: the model object
         tm: the timestep
@@ -41,33 +45,73 @@ def commodity_balance(m, tm, sit, com):
         balance: net value of consumed (positive) or provided (negative) power
 
     """
-    balance = (sum(m.e_pro_in[(tm, site, process, com)]
+    try:
+        adjacent = m.balance_index[sit, com]
+    except KeyError:
+        # neither process, transmission nor storage touch (sit, com)
+        return 0
+
+    balance = (sum(m.e_pro_in[(tm,) + pro]
                    # usage as input for process increases balance
-                   for site, process in m.pro_tuples
-                   if site == sit and (process, com) in m.r_in_dict)
-               - sum(m.e_pro_out[(tm, site, process, com)]
+                   for pro in adjacent['pro_in'])
+               - sum(m.e_pro_out[(tm,) + pro]
                      # output from processes decreases balance
-                     for site, process in m.pro_tuples
-                     if site == sit and (process, com) in m.r_out_dict)
-               + sum(m.e_tra_in[(tm, site_in, site_out, transmission, com)]
+                     for pro in adjacent['pro_out'])
+               + sum(m.e_tra_in[(tm,) + tra]
                      # exports increase balance
-                     for site_in, site_out, transmission, commodity
-                     in m.tra_tuples
-                     if site_in == sit and commodity == com)
-               - sum(m.e_tra_out[(tm, site_in, site_out, transmission, com)]
+                     for tra in adjacent['tra_in'])
+               - sum(m.e_tra_out[(tm,) + tra]
                      # imports decrease balance
-                     for site_in, site_out, transmission, commodity
-                     in m.tra_tuples
-                     if site_out == sit and commodity == com)
-               + sum(m.e_sto_in[(tm, site, storage, com)] -
-                     m.e_sto_out[(tm, site, storage, com)]
+                     for tra in adjacent['tra_out'])
+               + sum(m.e_sto_in[(tm,) + sto] -
+                     m.e_sto_out[(tm,) + sto]
                      # usage as input for storage increases consumption
                      # output from storage decreases consumption
-                     for site, storage, commodity in m.sto_tuples
-                     if site == sit and commodity == com))
+                     for sto in adjacent['sto']))
     return balance
 
 
+def commodity_balance_index(m):
+    """Build the adjacency index of tuples used by commodity_balance.
+
+    Groups the process input/output, transmission and storage tuples of a
+    model by the (site, commodity) vertex they are connected to. Building the
+    index needs a single pass over each tuple set, so that the vertex rules
+    grow linearly with model size instead of scanning all tuples per vertex.
+
+    Args:
+        m: the model object with the sets pro_input_tuples, pro_output_tuples,
+            tra_tuples and sto_tuples
+
+    Returns:
+        a dict with (site, commodity) keys and dicts of tuple lists as values.
+        The lists are 'pro_in', 'pro_out' ((site, process, commodity)),
+        'tra_in' (exports, site is Site In), 'tra_out' (imports, site is
+        Site Out), both (site in, site out, transmission, commodity), and
+        'sto' ((site, storage, commodity)).
+
+    """
+    index = {}
+
+    def adjacent(sit, com):
+        if (sit, com) not in index:
+            index[sit, com] = {'pro_in': [], 'pro_out': [],
+                               'tra_in': [], 'tra_out': [],
+                               'sto': []}
+        return index[sit, com]
+
+    for sit, pro, com in m.pro_input_tuples:
+        adjacent(sit, com)['pro_in'].append((sit, pro, com))
+    for sit, pro, com in m.pro_output_tuples:
+        adjacent(sit, com)['pro_out'].append((sit, pro, com))
+    for sin, sout, tra, com in m.tra_tuples:
+        adjacent(sin, com)['tra_in'].append((sin, sout, tra, com))
+        adjacent(sout, com)['tra_out'].append((sin, sout, tra, com))
+    for sit, sto, com in m.sto_tuples:
+        adjacent(sit, com)['sto'].append((sit, sto, com))
+    return index
+
+
 def commodity_subset(com_tuples, type_name):
     """ Unique list of commodity names for given type.
 
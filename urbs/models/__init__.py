@@ -1,5 +1,8 @@
 from .super import urbsType
+from .cut_pool import CutPool
+from .stabilization import TrustRegion
 from .normal import Normal
+from .normal_matrix import NormalMatrix
 from .divide_timesteps_master import DivideTimestepsMaster
 from .divide_timesteps_sub import DivideTimestepsSub
 from .regional_master import RegionalMaster
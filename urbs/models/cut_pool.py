@@ -0,0 +1,121 @@
+import numpy as np
+from .super import linear_expression
+
+
+class CutPool(object):
+    """Manages the Benders cuts in Cut_Defn of one problem.
+
+    Without a cut pool, Cut_Defn only ever grows. A CutPool added to a
+    problem (problem.cut_pool = CutPool()) filters and ages the cuts:
+
+    - a new cut whose normalized coefficients equal those of a pooled cut is
+      skipped if it is not stronger, otherwise it replaces the pooled cut;
+    - after each solve, a cut counts as binding if its slack is zero (up to
+      tolerance) or, if the problem has a dual suffix, its dual is nonzero.
+      Cuts that were not binding in max_age consecutive solves are
+      deactivated;
+    - deactivated cuts which the new solution violates are reactivated and
+      the problem is solved again (see ModelSuper.solve).
+
+    Deactivated cuts keep their index in Cut_Defn. Use one CutPool per
+    problem.
+    """
+    def __init__(self, max_age=10, tolerance=1e-6, digits=8):
+        """Initializes an empty cut pool.
+
+        Args:
+            max_age: number of consecutive solves in which a cut is not
+                binding before it is deactivated; None never deactivates
+            tolerance: relative tolerance of slacks, duals and cut strength
+            digits: number of digits of the normalized coefficients used to
+                detect duplicate cuts
+        """
+        self.max_age = max_age
+        self.tolerance = tolerance
+        self.digits = digits
+        # Cut_Defn index -> [hash key, normalized rhs, age]
+        self._cuts = {}
+        # hash key -> Cut_Defn index
+        self._keys = {}
+        self._inactive = set()
+        self.statistics = {'added': 0, 'duplicates': 0, 'replaced': 0,
+                           'deactivated': 0, 'reactivated': 0}
+
+    def add(self, problem, coefficients, variables, rhs):
+        """Adds the cut sum(coefficients * variables) >= rhs to problem.Cut_Defn,
+        unless an equal or stronger cut is in the pool.
+
+        Args:
+            problem: the problem receiving the cut
+            coefficients: array of coefficients
+            variables: list of variable data objects, aligned with coefficients
+            rhs: right hand side of the cut
+
+        Returns:
+            the index of the new cut in Cut_Defn or None if it was skipped
+        """
+        coefficients = np.asarray(coefficients, dtype=float)
+        nonzero = np.flatnonzero(coefficients)
+        norm = np.abs(coefficients[nonzero]).max() if len(nonzero) > 0 else 1.0
+        key = (tuple(id(variables[k]) for k in nonzero),
+               tuple(np.round(coefficients[nonzero] / norm, self.digits).tolist()))
+        normalized_rhs = rhs / norm
+
+        index = self._keys.get(key)
+        if index is not None:
+            if normalized_rhs <= self._cuts[index][1] + self.tolerance * max(1, abs(normalized_rhs)):
+                self.statistics['duplicates'] += 1
+                if index in self._inactive:
+                    self._activate(problem, index)
+                return None
+            # the new cut dominates the pooled one
+            problem.Cut_Defn[index].deactivate()
+            self._inactive.discard(index)
+            del self._cuts[index]
+            self.statistics['replaced'] += 1
+
+        problem.Cut_Defn.add(linear_expression(coefficients, variables) >= rhs)
+        index = len(problem.Cut_Defn)
+        self._cuts[index] = [key, normalized_rhs, 0]
+        self._keys[key] = index
+        self.statistics['added'] += 1
+        return index
+
+    def update(self, problem):
+        """Ages the cuts after a solve of problem, deactivates the cuts which
+        were not binding for max_age solves and reactivates violated ones.
+
+        Args:
+            problem: the solved problem
+
+        Returns:
+            number of reactivated cuts; if nonzero, the problem has to be
+            solved again
+        """
+        duals = getattr(problem, 'dual', None)
+        reactivated = 0
+        for index, cut in self._cuts.items():
+            con = problem.Cut_Defn[index]
+            slack = con.body() - con.lower()
+            scale = max(1, abs(con.lower()))
+            if index in self._inactive:
+                if slack < -self.tolerance * scale:
+                    self._activate(problem, index)
+                    reactivated += 1
+                continue
+            binding = slack <= self.tolerance * scale
+            if duals is not None and con in duals:
+                binding = binding or abs(duals[con]) > self.tolerance
+            cut[2] = 0 if binding else cut[2] + 1
+            if self.max_age is not None and cut[2] >= self.max_age:
+                con.deactivate()
+                self._inactive.add(index)
+                self.statistics['deactivated'] += 1
+        return reactivated
+
+    def _activate(self, problem, index):
+        """ Reactivate the inactive cut Cut_Defn[index] and reset its age """
+        problem.Cut_Defn[index].activate()
+        self._inactive.discard(index)
+        self._cuts[index][2] = 0
+        self.statistics['reactivated'] += 1
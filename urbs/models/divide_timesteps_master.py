@@ -1,9 +1,9 @@
 from .divide_timesteps_super import *
-from ..pyomoio import get_entity
 
 
 class DivideTimestepsMaster(DivideTimestepsSuper):
-    def __init__(self, data, timesteps=None, supportsteps=[], dt=1, dual=False, model_type=urbsType.master):
+    def __init__(self, data, timesteps=None, supportsteps=[], dt=1, dual=False, model_type=urbsType.master,
+                 cut_mode='multi'):
         """Initiates this class as a ConcreteModel urbs object from given input data.
 
         Args:
@@ -13,8 +13,13 @@ class DivideTimestepsMaster(DivideTimestepsSuper):
             dt: timestep duration in hours (default: 1)
             dual: set True to add dual variables to model (slower); default: False
             model_type: model_type of the problem; 0: Normal(default), 1:Sub, 2: Master
+            cut_mode: how add_cuts adds the cuts of several subs; 'multi' (default): one cut per sub,
+                'aggregated': the sum of the sub cuts as a single cut
         """
+        if cut_mode not in ('multi', 'aggregated'):
+            raise ValueError("cut_mode must be 'multi' or 'aggregated', not " + repr(cut_mode))
         super().__init__(data, timesteps, supportsteps, dt, dual, model_type)
+        self.cut_mode = cut_mode
         # Initialize sub model specific things
         self.name = 'urbs-master'
         print(self.name + ' is created.')
@@ -142,6 +147,7 @@ class DivideTimestepsMaster(DivideTimestepsSuper):
             rule=res_initial_and_final_storage_state_rule,
             doc='storage content initial == and final >= storage.init * capacity')
 
+    @traced('add_cut')
     def add_cut(self, cut_generating_problem, readable_cuts=False):
         """
         Adds a cut to the master problem, which is generated by a sub problem
@@ -150,54 +156,117 @@ class DivideTimestepsMaster(DivideTimestepsSuper):
             cut_generating_problem: sub problem which generates the cut
             readable_cuts:  scale cuts to make them easier to read (may cause numerical issues)
         """
+        cut = self._get_cut(cut_generating_problem, readable_cuts)
+        if cut is not None:
+            self.add_cut_constraint(*cut)
+
+    @traced('add_cuts')
+    def add_cuts(self, cut_generating_problems, readable_cuts=False):
+        """
+        Adds the cuts of several sub problems at once, e.g. after solving them in parallel
+
+        In cut_mode 'multi', each sub problem adds its own cut to the master problem. In cut_mode 'aggregated',
+        the cuts of all sub problems are summed up to a single cut, which keeps the master problem small.
+
+        Args:
+            cut_generating_problems: sub problems which generate the cuts
+            readable_cuts:  scale cuts to make them easier to read (may cause numerical issues)
+        """
+        cuts = [self._get_cut(sub, readable_cuts) for sub in cut_generating_problems]
+        cuts = [cut for cut in cuts if cut is not None]
+        if self.cut_mode == 'multi':
+            for cut in cuts:
+                self.add_cut_constraint(*cut)
+        elif len(cuts) > 0:
+            variables = OrderedDict()
+            for _, cut_variables, _ in cuts:
+                for var in cut_variables:
+                    variables.setdefault(id(var), (len(variables), var))
+            coefficients = np.zeros(len(variables))
+            for cut_coefficients, cut_variables, _ in cuts:
+                positions = [variables[id(var)][0] for var in cut_variables]
+                np.add.at(coefficients, positions, cut_coefficients)
+            self.add_cut_constraint(coefficients, [var for _, var in variables.values()],
+                                    sum(rhs for _, _, rhs in cuts))
+
+    def _get_cut(self, cut_generating_problem, readable_cuts=False):
+        """
+        Calculates the cut generated by a sub problem
+
+        Args:
+            cut_generating_problem: sub problem which generates the cut
+            readable_cuts:  scale cuts to make them easier to read (may cause numerical issues)
+
+        Returns:
+            (coefficients, variables, rhs) of the cut sum(coefficients * variables) >= rhs or None if the cut is
+            skipped
+        """
         if cut_generating_problem.Lambda() < 0.000001:
             print('Cut skipped for subproblem ' + str(cut_generating_problem) + ' (Lambda = ' + str(
                 cut_generating_problem.Lambda()) + ')')
-            return
-
-        # dual variables
-        multi_index = pd.MultiIndex.from_tuples([(t,) + sto
-                                                 for t in self.t
-                                                 for sto in self.sto_tuples],
-                                                names=['t', 'sit', 'sto', 'com'])
-        dual_sto = pd.Series(0, index=multi_index)
-        dual_sto_help = get_entity(cut_generating_problem, 'res_initial_and_final_storage_state')
-        dual_sto = dual_sto.add(-abs(dual_sto_help.loc[[cut_generating_problem.ts[1]]]), fill_value=0)
-        dual_sto = dual_sto.add(abs(dual_sto_help.loc[[cut_generating_problem.ts[-1]]]), fill_value=0)
-
-        dual_pro = get_entity(cut_generating_problem, 'def_process_capacity')
-        dual_tra = get_entity(cut_generating_problem, 'def_transmission_capacity')
-        dual_sto_cap = get_entity(cut_generating_problem, 'def_storage_capacity')
-        dual_sto_capl = get_entity(cut_generating_problem, 'def_storage_capacity_l')
-        dual_sto_pow = get_entity(cut_generating_problem, 'def_storage_power')
-        dual_com_src = get_entity(cut_generating_problem, 'sub_commodity_source')
-        dual_env = get_entity(cut_generating_problem, 'res_global_co2_limit')
+            return None
 
+        template = self._cut_templates.get(cut_generating_problem)
+        if template is None:
+            template = self._create_cut_template(cut_generating_problem)
+            self._cut_templates[cut_generating_problem] = template
+
+        # cut coefficients from the duals of the sub problem
+        coefficients = template.coefficients(cut_generating_problem)
         dual_zero = cut_generating_problem.dual[cut_generating_problem.sub_costs]
         Lambda = cut_generating_problem.Lambda()
-
-        cut_expression = - 1 * (sum(dual_pro[pro] * self.cap_pro[pro] for pro in self.pro_tuples) +
-                                sum(dual_tra[tra] * self.cap_tra[tra] for tra in self.tra_tuples) +
-                                sum((dual_sto_cap[sto] - dual_sto_capl[sto]) * self.cap_sto_c[sto] for sto in self.sto_tuples) +
-                                sum(dual_sto_pow[sto] * self.cap_sto_p[sto] for sto in self.sto_tuples) +
-                                sum([dual_sto[(t,) + sto] * self.e_sto_con[(t,) + sto]
-                                     for t in self.t
-                                     for sto in self.sto_tuples]) +
-                                sum([dual_com_src[com] * self.e_co_stock[(cut_generating_problem.tm[-1],) + com]
-                                     for com in self.com_tuples if
-                                     com[1] in self.com_stock
-                                     and not math.isinf(self.commodity_dict['max'][com])]) +
-                                sum([dual_env[0] * self.e_co_stock[(cut_generating_problem.tm[-1],) + com]
-                                     for com in self.com_tuples
-                                     if com[1] in self.com_env]) +
-                                dual_zero * self.eta[cut_generating_problem.tm[-1]])
+        cut_value = coefficients.dot(template.values(getattr(cut_generating_problem, 'cut_point', None)))
 
         # cut generation
         if readable_cuts and dual_zero != 0:
-            cut = 1 / (-dual_zero) * cut_expression >= 1 / (-dual_zero) * (Lambda + cut_expression())
+            scale = 1 / (-dual_zero)
         else:
-            cut = cut_expression >= Lambda + cut_expression()
-        self.Cut_Defn.add(cut)
+            scale = 1
+        return scale * coefficients, template.variables, scale * (Lambda + cut_value)
+
+    def _create_cut_template(self, cut_generating_problem):
+        """
+        Creates the CutTemplate of the cuts generated by a sub problem
+
+        Args:
+            cut_generating_problem: sub problem which generates the cuts
+
+        Returns:
+            the CutTemplate
+        """
+        sub = cut_generating_problem
+        template = CutTemplate()
+        template.add([sub.def_process_capacity[pro] for pro in self.pro_tuples],
+                     [self.cap_pro[pro] for pro in self.pro_tuples], -1)
+        template.add([sub.def_transmission_capacity[tra] for tra in self.tra_tuples],
+                     [self.cap_tra[tra] for tra in self.tra_tuples], -1)
+        template.add([sub.def_storage_capacity[sto] for sto in self.sto_tuples],
+                     [self.cap_sto_c[sto] for sto in self.sto_tuples], -1)
+        template.add([sub.def_storage_capacity_l[sto] for sto in self.sto_tuples],
+                     [self.cap_sto_c[sto] for sto in self.sto_tuples], 1)
+        template.add([sub.def_storage_power[sto] for sto in self.sto_tuples],
+                     [self.cap_sto_p[sto] for sto in self.sto_tuples], -1)
+
+        # storage content: - |dual| at the first and + |dual| at the last
+        # support step of the sub problem
+        for t, factor in [(sub.ts[1], 1), (sub.ts[-1], -1)]:
+            template.add([sub.res_initial_and_final_storage_state[(t,) + sto]
+                          for sto in self.sto_tuples],
+                         [self.e_sto_con[(t,) + sto] for sto in self.sto_tuples],
+                         factor, absolute=True)
+
+        tm = sub.tm[-1]
+        stock = [com for com in self.com_tuples
+                 if com[1] in self.com_stock and not math.isinf(self.commodity_dict['max'][com])]
+        template.add([sub.sub_commodity_source[com] for com in stock],
+                     [self.e_co_stock[(tm,) + com] for com in stock], -1)
+        # the CO2 limit has no dual if it is skipped (infinite limit)
+        if len(sub.res_global_co2_limit) > 0:
+            env = [com for com in self.com_tuples if com[1] in self.com_env]
+            template.add([sub.res_global_co2_limit] * len(env),
+                         [self.e_co_stock[(tm,) + com] for com in env], -1)
+        template.add([sub.sub_costs], [self.eta[tm]], -1)
+        return template
 
 
 # DivideTimestepsMaster specific Constraints
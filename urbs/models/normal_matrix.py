@@ -0,0 +1,855 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from .super import urbsType
+from ..input import PreparedInput
+from ..modelhelper import commodity_subset
+
+COST_TYPES = ['Invest', 'Fixed', 'Variable', 'Fuel', 'Environmental']
+
+
+class _Block(object):
+    """Consecutive variables or constraint rows of one model entity.
+
+    A block covers the product of an (optional) list of time steps and an
+    index of tuples, time step major, starting at column or row offset.
+    """
+    def __init__(self, offset, tuples, times=None, first=0):
+        """Creates a block.
+
+        Args:
+            offset: first column or row of the block
+            tuples: pandas Index of the (non-time) index tuples
+            times: optional list of time steps
+            first: position of times[0] within all time steps of the model
+        """
+        self.offset = offset
+        self.tuples = tuples
+        self.times = times
+        self.first = first
+
+    def __len__(self):
+        if self.times is None:
+            return len(self.tuples)
+        return len(self.times) * len(self.tuples)
+
+    def pos(self, tuple_pos, time_pos=None):
+        """Return the columns or rows of given tuple and time positions.
+
+        Args:
+            tuple_pos: array of positions in self.tuples
+            time_pos: array of positions within all model time steps;
+                broadcast against tuple_pos, ignored for blocks without time
+
+        Returns:
+            array of columns or rows
+        """
+        if time_pos is None or self.times is None:
+            return self.offset + np.asarray(tuple_pos)
+        return (self.offset +
+                (np.asarray(time_pos) - self.first) * len(self.tuples) +
+                np.asarray(tuple_pos))
+
+    def index(self):
+        """Return the full index, with time step as first level."""
+        if self.times is None:
+            return self.tuples
+        n = len(self.tuples)
+        times = np.repeat(np.asarray(self.times), n)
+        if isinstance(self.tuples, pd.MultiIndex):
+            levels = [self.tuples.get_level_values(k).values
+                      for k in range(self.tuples.nlevels)]
+            names = list(self.tuples.names)
+        else:
+            levels = [self.tuples.values]
+            names = [self.tuples.name]
+        arrays = [times] + [np.tile(level, len(self.times))
+                            for level in levels]
+        return pd.MultiIndex.from_arrays(arrays, names=['t'] + names)
+
+
+class NormalMatrix(object):
+    def __init__(self, data, timesteps=None, dt=1):
+        """Assembles the linear program of the Normal model as sparse matrix.
+
+        Builds the same variables, constraints and objective as Normal, but
+        directly as coordinate (COO) arrays from the input frames, one
+        vectorized operation per constraint family instead of one Pyomo
+        expression per constraint. The program can be written to a free
+        format MPS file (see write) or be passed as arrays to gurobipy (see
+        solve); afterwards,
+        get_entity, get_constants, get_timeseries and save work on the
+        instance as on a solved Normal model.
+
+        Args:
+            data: a dict of 6 DataFrames with the keys 'commodity', 'process',
+                'transmission', 'storage', 'demand' and 'supim', or a
+                PreparedInput of it.
+            timesteps: optional list of timesteps, default: demand timeseries
+            dt: timestep duration in hours (default: 1)
+
+        Example:
+            >>> prob = NormalMatrix(read_excel('mimo-example.xlsx'), range(8761))
+            >>> prob.write('mimo-example.mps')  # or:
+            >>> prob.solve()
+            >>> save(prob, 'mimo-example.h5')
+        """
+        if not timesteps:
+            timesteps = data['demand'].index.tolist()
+        if isinstance(data, PreparedInput):
+            prepared = data
+        else:
+            prepared = PreparedInput(data)
+
+        self.name = 'urbs-normal-matrix'
+        self.model_type = urbsType.normal
+        self._data = prepared.data
+        self._prepared = prepared
+        self._result = None
+        self.objective_value = None
+
+        self.timesteps = list(timesteps)
+        self.dt = dt
+        self.weight = float(8760) / ((len(self.timesteps) - 1) * dt)
+
+        self._variables = OrderedDict()
+        self._constraints = OrderedDict()
+        self._num_variables = 0
+        self._num_rows = 0
+        self._free = []
+        self._terms = []
+        self._sense = []
+        self._rhs = []
+        self._range = []
+
+        self._create_sets()
+        self._create_variables()
+        self._create_commodity_constraints()
+        self._create_process_constraints()
+        self._create_transmission_constraints()
+        self._create_storage_constraints()
+        self._create_cost_constraints()
+        self._assemble()
+
+        print(self.name + ' is created.')
+
+    # Sets
+    # ====
+
+    def _create_sets(self):
+        """Create the tuple sets of Normal as (named) pandas indices."""
+        p = self._prepared
+        self.com_tuples = p.commodity.index.set_names(
+            ['sit', 'com', 'com_type'])
+        self.pro_tuples = p.process.index.set_names(['sit', 'pro'])
+        self.tra_tuples = p.transmission.index.set_names(
+            ['sit', 'sit_', 'tra', 'com'])
+        self.sto_tuples = p.storage.index.set_names(['sit', 'sto', 'com'])
+        self.pro_area_tuples = p.proc_area.index.set_names(['sit', 'pro'])
+
+        pro = self.pro_tuples.to_frame(index=False)
+        self.pro_input_tuples = _product_tuples(pro, p.r_in.index)
+        self.pro_output_tuples = _product_tuples(pro, p.r_out.index)
+        max_grad = p.process['max-grad'].values
+        self.pro_maxgrad_tuples = self.pro_tuples[max_grad < 1.0 / self.dt]
+
+        com_tuples = list(self.com_tuples)
+        self.com_supim = commodity_subset(com_tuples, 'SupIm')
+        self.com_stock = commodity_subset(com_tuples, 'Stock')
+        self.com_demand = commodity_subset(com_tuples, 'Demand')
+        self.com_env = commodity_subset(com_tuples, 'Env')
+        self.sit = p.commodity.index.get_level_values('Site').unique()
+
+    # Variables
+    # =========
+
+    def _add_variable(self, name, tuples, times=None, first=0, free=False):
+        block = _Block(self._num_variables, tuples, times, first)
+        self._variables[name] = block
+        if free:
+            self._free.append(np.arange(block.offset,
+                                        block.offset + len(block)))
+        self._num_variables += len(block)
+        return block
+
+    def _create_variables(self):
+        t, tm = self.timesteps, self.timesteps[1:]
+        var = self._add_variable
+        var('costs', pd.Index(COST_TYPES, name='cost_type'), free=True)
+        var('e_co_stock', self.com_tuples, tm, 1)
+        var('cap_pro', self.pro_tuples)
+        var('cap_pro_new', self.pro_tuples)
+        var('tau_pro', self.pro_tuples, t)
+        var('e_pro_in', self.pro_input_tuples, tm, 1)
+        var('e_pro_out', self.pro_output_tuples, tm, 1)
+        var('cap_tra', self.tra_tuples)
+        var('cap_tra_new', self.tra_tuples)
+        var('e_tra_in', self.tra_tuples, tm, 1)
+        var('e_tra_out', self.tra_tuples, tm, 1)
+        var('cap_sto_c', self.sto_tuples)
+        var('cap_sto_c_new', self.sto_tuples)
+        var('cap_sto_p', self.sto_tuples)
+        var('cap_sto_p_new', self.sto_tuples)
+        var('e_sto_in', self.sto_tuples, tm, 1)
+        var('e_sto_out', self.sto_tuples, tm, 1)
+        var('e_sto_con', self.sto_tuples, t)
+
+    # Constraints
+    # ===========
+
+    def _add_constraint(self, name, tuples, sense, rhs, times=None, first=0,
+                        upper=None):
+        """Add rows of one constraint family.
+
+        Args:
+            name: constraint name, as in Normal
+            tuples: pandas Index of the constraint tuples
+            sense: 'E', 'L' or 'G'
+            rhs: right hand side, scalar or array of all rows
+            times: optional list of time steps of the rows
+            first: position of times[0] within all time steps
+            upper: optional upper bounds of ranged rows (sense 'G' with rhs
+                as lower bound); infinite values give plain 'G' rows
+
+        Returns:
+            the _Block of the added rows
+        """
+        block = _Block(self._num_rows, tuples, times, first)
+        n = len(block)
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=float), (n,))
+        sense = np.full(n, sense, dtype='U1')
+        rng = np.full(n, np.nan)
+        if upper is not None:
+            upper = np.broadcast_to(np.asarray(upper, dtype=float), (n,))
+            equal = upper == rhs
+            sense[equal] = 'E'
+            ranged = ~equal & np.isfinite(upper)
+            rng[ranged] = upper[ranged] - rhs[ranged]
+        self._constraints[name] = block
+        self._sense.append(sense)
+        self._rhs.append(rhs)
+        self._range.append(rng)
+        self._num_rows += n
+        return block
+
+    def _add_terms(self, rows, variable, tuple_pos, time_pos=None, coef=1.0):
+        """Add coefficients of one variable to rows; arguments broadcast."""
+        cols = self._variables[variable].pos(tuple_pos, time_pos)
+        rows, cols, coef = np.broadcast_arrays(rows, cols,
+                                               np.asarray(coef, dtype=float))
+        self._terms.append((rows.ravel(), cols.ravel(), coef.ravel()))
+
+    def _add_time_terms(self, block, row_pos, variable, var_pos, coef=1.0,
+                        shift=0):
+        """Add coefficients to the rows of a time-indexed constraint block.
+
+        Args:
+            block: constraint _Block with times
+            row_pos: array of tuple positions of the rows
+            variable: variable name
+            var_pos: array of tuple positions of the variable, one per row_pos
+            coef: coefficients, scalar, per tuple or (time x tuple) array
+            shift: time step offset of the variable, e.g. -1 for t-1
+        """
+        time_pos = block.first + np.arange(len(block.times))[:, None]
+        rows = block.pos(np.asarray(row_pos)[None, :], time_pos)
+        self._add_terms(rows, variable, np.asarray(var_pos)[None, :],
+                        time_pos + shift, coef)
+
+    def _add_balance_terms(self, block, row_pos, keys, factor, total=False):
+        """Add factor * commodity balance of (site, commodity) keys to rows.
+
+        Vectorized counterpart of modelhelper.commodity_balance: consumption
+        by processes, exports and storage input count positive, production,
+        imports and storage output negative.
+
+        Args:
+            block: constraint _Block; time-indexed unless total is True
+            row_pos: array of tuple positions of the rows, one per key
+            keys: DataFrame with columns 'sit' and 'com'
+            factor: scalar or array (one per key) multiplying the balance
+            total: if True, sum the balance of all modelled time steps in
+                each row instead of one row per time step
+        """
+        keys = pd.DataFrame({'sit': np.asarray(keys['sit']),
+                             'com': np.asarray(keys['com']),
+                             '_key': np.arange(len(keys))})
+        row_pos = np.asarray(row_pos)
+        factor = np.broadcast_to(np.asarray(factor, dtype=float),
+                                 (len(keys),))
+        for variable, frame, sign in self._balance_frames():
+            pairs = keys.merge(frame, on=['sit', 'com'])
+            if pairs.empty:
+                continue
+            key = pairs['_key'].values
+            coef = sign * factor[key]
+            if total:
+                time_pos = np.arange(1, len(self.timesteps))[:, None]
+                self._add_terms(block.pos(row_pos[key])[None, :], variable,
+                                pairs['_pos'].values[None, :], time_pos,
+                                coef[None, :])
+            else:
+                self._add_time_terms(block, row_pos[key], variable,
+                                     pairs['_pos'].values, coef[None, :])
+
+    def _balance_frames(self):
+        """Return (variable, DataFrame of sit, com, _pos, sign) per flow."""
+        def frame(tuples, site_level):
+            return pd.DataFrame({
+                'sit': tuples.get_level_values(site_level),
+                'com': tuples.get_level_values('com'),
+                '_pos': np.arange(len(tuples))})
+
+        return [('e_pro_in', frame(self.pro_input_tuples, 'sit'), 1.0),
+                ('e_pro_out', frame(self.pro_output_tuples, 'sit'), -1.0),
+                ('e_tra_in', frame(self.tra_tuples, 'sit'), 1.0),
+                ('e_tra_out', frame(self.tra_tuples, 'sit_'), -1.0),
+                ('e_sto_in', frame(self.sto_tuples, 'sit'), 1.0),
+                ('e_sto_out', frame(self.sto_tuples, 'sit'), -1.0)]
+
+    def _create_commodity_constraints(self):
+        p = self._prepared
+        tm = self.timesteps[1:]
+        com = self.com_tuples.get_level_values('com')
+        sit = self.com_tuples.get_level_values('sit')
+        keys = pd.DataFrame({'sit': sit, 'com': com})
+        positions = np.arange(len(self.com_tuples))
+        stock = com.isin(self.com_stock)
+        env = com.isin(self.com_env)
+        max_per_step = p.commodity['maxperstep'].values.astype(float)
+        max_total = p.commodity['max'].values.astype(float)
+
+        # vertex equation: - balance + stock purchase == demand
+        vertex = ~env & ~com.isin(self.com_supim)
+        demand = np.zeros((len(tm), len(self.com_tuples)))
+        for k in np.flatnonzero(vertex & com.isin(self.com_demand)):
+            if (sit[k], com[k]) in p.demand.columns:
+                demand[:, k] = p.demand.loc[tm, (sit[k], com[k])].values
+        rows = positions[vertex]
+        block = self._add_constraint(
+            'res_vertex', self.com_tuples[vertex], 'E', demand[:, vertex].ravel(),
+            tm, 1)
+        row_pos = np.arange(len(rows))
+        self._add_balance_terms(block, row_pos, keys.iloc[rows], -1.0)
+        self._add_time_terms(block, row_pos[stock[vertex]], 'e_co_stock',
+                             rows[stock[vertex]])
+
+        # stock commodity purchase per step and in total
+        select = stock & np.isfinite(max_per_step)
+        block = self._add_constraint(
+            'res_stock_step', self.com_tuples[select], 'L',
+            np.tile(max_per_step[select], len(tm)), tm, 1)
+        self._add_time_terms(block, np.arange(select.sum()), 'e_co_stock',
+                             positions[select])
+        select = stock & np.isfinite(max_total)
+        block = self._add_constraint(
+            'res_stock_total', self.com_tuples[select], 'L', max_total[select])
+        self._add_terms(block.pos(np.arange(select.sum()))[None, :],
+                        'e_co_stock', positions[select][None, :],
+                        np.arange(1, len(self.timesteps))[:, None],
+                        self.dt * self.weight)
+
+        # environmental commodity output per step and in total
+        select = env & np.isfinite(max_per_step)
+        block = self._add_constraint(
+            'res_env_step', self.com_tuples[select], 'L',
+            np.tile(max_per_step[select], len(tm)), tm, 1)
+        self._add_balance_terms(block, np.arange(select.sum()),
+                                keys[select], -1.0)
+        select = env & np.isfinite(max_total)
+        block = self._add_constraint(
+            'res_env_total', self.com_tuples[select], 'L', max_total[select])
+        self._add_balance_terms(block, np.arange(select.sum()), keys[select],
+                                -self.dt * self.weight, total=True)
+
+        # global CO2 limit
+        limit = p.global_prop.loc['CO2 limit', 'value']
+        if not math.isinf(limit) and limit >= 0:
+            block = self._add_constraint(
+                'res_global_co2_limit', pd.Index([None]), 'L', limit)
+            self._add_balance_terms(
+                block, np.zeros(len(self.sit), dtype=int),
+                pd.DataFrame({'sit': self.sit, 'com': 'CO2'}),
+                -self.dt * self.weight, total=True)
+
+    def _create_process_constraints(self):
+        p = self._prepared
+        tm = self.timesteps[1:]
+        n_pro = len(self.pro_tuples)
+        positions = np.arange(n_pro)
+
+        block = self._add_constraint(
+            'def_process_capacity', self.pro_tuples, 'L',
+            p.process['inst-cap'].values)
+        self._add_terms(block.pos(positions), 'cap_pro', positions)
+        self._add_terms(block.pos(positions), 'cap_pro_new', positions, None,
+                        -1.0)
+
+        # process input/output == throughput * ratio
+        for name, variable, tuples, ratio in [
+                ('def_process_input', 'e_pro_in', self.pro_input_tuples,
+                 p.r_in),
+                ('def_process_output', 'e_pro_out', self.pro_output_tuples,
+                 p.r_out)]:
+            block = self._add_constraint(name, tuples, 'E', 0.0, tm, 1)
+            flow = np.arange(len(tuples))
+            pro = self.pro_tuples.get_indexer(tuples.droplevel('com'))
+            ratio = ratio.reindex(pd.MultiIndex.from_arrays(
+                [tuples.get_level_values('pro'),
+                 tuples.get_level_values('com')])).values
+            self._add_time_terms(block, flow, variable, flow)
+            self._add_time_terms(block, flow, 'tau_pro', pro, -ratio)
+
+        # intermittent supply: input <= capacity * supim timeseries
+        inputs = self.pro_input_tuples
+        select = np.flatnonzero(
+            inputs.get_level_values('com').isin(self.com_supim))
+        tuples = inputs[select]
+        block = self._add_constraint('def_intermittent_supply', tuples, 'L',
+                                     0.0, tm, 1)
+        supim = p.supim.loc[tm, list(zip(
+            tuples.get_level_values('sit'),
+            tuples.get_level_values('com')))].values
+        rows = np.arange(len(select))
+        self._add_time_terms(block, rows, 'e_pro_in', select)
+        self._add_time_terms(block, rows, 'cap_pro',
+                             self.pro_tuples.get_indexer(
+                                 tuples.droplevel('com')), -supim)
+
+        # throughput <= capacity
+        block = self._add_constraint('res_process_throughput_by_capacity',
+                                     self.pro_tuples, 'L', 0.0, tm, 1)
+        self._add_time_terms(block, positions, 'tau_pro', positions)
+        self._add_time_terms(block, positions, 'cap_pro', positions, -1.0)
+
+        # maximum gradient: |tau[t] - tau[t-1]| <= cap * max-grad * dt
+        tuples = self.pro_maxgrad_tuples
+        pro = self.pro_tuples.get_indexer(tuples)
+        grad = p.process['max-grad'].values[pro] * self.dt
+        rows = np.arange(len(tuples))
+        for name, sign in [('res_process_maxgrad_lower', 1.0),
+                           ('res_process_maxgrad_upper', -1.0)]:
+            block = self._add_constraint(name, tuples, 'L', 0.0, tm, 1)
+            self._add_time_terms(block, rows, 'tau_pro', pro, sign, shift=-1)
+            self._add_time_terms(block, rows, 'tau_pro', pro, -sign)
+            self._add_time_terms(block, rows, 'cap_pro', pro, -grad)
+
+        # cap-lo <= capacity <= cap-up
+        block = self._add_constraint(
+            'res_process_capacity', self.pro_tuples, 'G',
+            p.process['cap-lo'].values, upper=p.process['cap-up'].values)
+        self._add_terms(block.pos(positions), 'cap_pro', positions)
+
+        # used process area <= site area
+        area = self.pro_area_tuples
+        area_per_cap = p.proc_area.values
+        used = pd.Series(area_per_cap).groupby(
+            area.get_level_values('sit')).sum()
+        sites = [sit for sit in self.sit
+                 if p.site.loc[sit]['area'] >= 0 and used.get(sit, 0) > 0]
+        block = self._add_constraint(
+            'res_area', pd.Index(sites, name='sit'), 'L',
+            p.site.loc[sites, 'area'].values)
+        select = np.flatnonzero(area.get_level_values('sit').isin(sites))
+        rows = pd.Index(sites).get_indexer(
+            area.get_level_values('sit')[select])
+        self._add_terms(block.pos(rows), 'cap_pro',
+                        self.pro_tuples.get_indexer(area[select]), None,
+                        area_per_cap[select])
+
+    def _create_transmission_constraints(self):
+        p = self._prepared
+        tm = self.timesteps[1:]
+        tuples = self.tra_tuples
+        positions = np.arange(len(tuples))
+
+        block = self._add_constraint(
+            'def_transmission_capacity', tuples, 'L',
+            p.transmission['inst-cap'].values)
+        self._add_terms(block.pos(positions), 'cap_tra', positions)
+        self._add_terms(block.pos(positions), 'cap_tra_new', positions, None,
+                        -1.0)
+
+        block = self._add_constraint('def_transmission_output', tuples, 'E',
+                                     0.0, tm, 1)
+        self._add_time_terms(block, positions, 'e_tra_out', positions)
+        self._add_time_terms(block, positions, 'e_tra_in', positions,
+                             -p.transmission['eff'].values)
+
+        block = self._add_constraint('res_transmission_input_by_capacity',
+                                     tuples, 'L', 0.0, tm, 1)
+        self._add_time_terms(block, positions, 'e_tra_in', positions)
+        self._add_time_terms(block, positions, 'cap_tra', positions, -1.0)
+
+        block = self._add_constraint(
+            'res_transmission_capacity', tuples, 'G',
+            p.transmission['cap-lo'].values,
+            upper=p.transmission['cap-up'].values)
+        self._add_terms(block.pos(positions), 'cap_tra', positions)
+
+        reverse = tuples.get_indexer(pd.MultiIndex.from_arrays(
+            [tuples.get_level_values('sit_'), tuples.get_level_values('sit'),
+             tuples.get_level_values('tra'), tuples.get_level_values('com')]))
+        if (reverse < 0).any():
+            raise KeyError('Transmissions without reverse direction: ' +
+                           ', '.join(str(tra) for tra in
+                                     tuples[reverse < 0]))
+        block = self._add_constraint('res_transmission_symmetry', tuples,
+                                     'E', 0.0)
+        self._add_terms(block.pos(positions), 'cap_tra', positions)
+        self._add_terms(block.pos(positions), 'cap_tra', reverse, None, -1.0)
+
+    def _create_storage_constraints(self):
+        p = self._prepared
+        t, tm = self.timesteps, self.timesteps[1:]
+        tuples = self.sto_tuples
+        positions = np.arange(len(tuples))
+        storage = p.storage
+
+        # content[t] == content[t-1] * (1 - discharge) ** dt
+        #               + input * eff-in * dt - output / eff-out * dt
+        block = self._add_constraint('def_storage_state', tuples, 'E', 0.0,
+                                     tm, 1)
+        self._add_time_terms(block, positions, 'e_sto_con', positions)
+        self._add_time_terms(block, positions, 'e_sto_con', positions,
+                             -(1 - storage['discharge'].values) ** self.dt,
+                             shift=-1)
+        self._add_time_terms(block, positions, 'e_sto_in', positions,
+                             -storage['eff-in'].values * self.dt)
+        self._add_time_terms(block, positions, 'e_sto_out', positions,
+                             self.dt / storage['eff-out'].values)
+
+        for name, variable, column in [
+                ('def_storage_power', 'cap_sto_p', 'inst-cap-p'),
+                ('def_storage_capacity', 'cap_sto_c', 'inst-cap-c')]:
+            block = self._add_constraint(name, tuples, 'L',
+                                         storage[column].values)
+            self._add_terms(block.pos(positions), variable, positions)
+            self._add_terms(block.pos(positions), variable + '_new',
+                            positions, None, -1.0)
+
+        for name, variable, capacity, times, first in [
+                ('res_storage_input_by_power', 'e_sto_in', 'cap_sto_p', tm, 1),
+                ('res_storage_output_by_power', 'e_sto_out', 'cap_sto_p', tm,
+                 1),
+                ('res_storage_state_by_capacity', 'e_sto_con', 'cap_sto_c', t,
+                 0)]:
+            block = self._add_constraint(name, tuples, 'L', 0.0, times, first)
+            self._add_time_terms(block, positions, variable, positions)
+            self._add_time_terms(block, positions, capacity, positions, -1.0)
+
+        for name, variable, suffix in [
+                ('res_storage_power', 'cap_sto_p', 'p'),
+                ('res_storage_capacity', 'cap_sto_c', 'c')]:
+            block = self._add_constraint(
+                name, tuples, 'G', storage['cap-lo-' + suffix].values,
+                upper=storage['cap-up-' + suffix].values)
+            self._add_terms(block.pos(positions), variable, positions)
+
+        # content[first] <= init * capacity <= content[last]; Normal's
+        # res_initial_and_final_storage_state in two blocks, without its lower
+        # bounds in between, which coincide with the variable bounds
+        init = storage['init'].values
+        for name, time, sense in [('res_initial_storage_state', t[0], 'L'),
+                                  ('res_final_storage_state', t[-1], 'G')]:
+            block = self._add_constraint(name, tuples, sense, 0.0, [time],
+                                         len(t) - 1 if sense == 'G' else 0)
+            self._add_time_terms(block, positions, 'e_sto_con', positions)
+            self._add_time_terms(block, positions, 'cap_sto_c', positions,
+                                 -init)
+
+    def _create_cost_constraints(self):
+        """Create def_costs: costs[type] - sum of cost terms == 0."""
+        p = self._prepared
+        block = self._add_constraint('def_costs', pd.Index(COST_TYPES),
+                                     'E', 0.0)
+        row = dict(zip(COST_TYPES, block.pos(np.arange(len(COST_TYPES)))))
+        self._add_terms(block.pos(np.arange(len(COST_TYPES))), 'costs',
+                        np.arange(len(COST_TYPES)))
+        weight, dt = self.weight, self.dt
+        tm_pos = np.arange(1, len(self.timesteps))[:, None]
+
+        def add(cost_type, variable, coef, times=False, select=None):
+            coef = np.asarray(coef, dtype=float)
+            positions = np.arange(len(coef))
+            if select is not None:
+                positions, coef = positions[select], coef[select]
+            if times:
+                self._add_terms(row[cost_type], variable, positions[None, :],
+                                tm_pos, -coef[None, :])
+            else:
+                self._add_terms(row[cost_type], variable, positions, None,
+                                -coef)
+
+        process, transmission, storage = p.process, p.transmission, p.storage
+        add('Invest', 'cap_pro_new',
+            process['inv-cost'] * process['annuity-factor'])
+        add('Invest', 'cap_tra_new',
+            transmission['inv-cost'] * transmission['annuity-factor'])
+        add('Invest', 'cap_sto_p_new',
+            storage['inv-cost-p'] * storage['annuity-factor'])
+        add('Invest', 'cap_sto_c_new',
+            storage['inv-cost-c'] * storage['annuity-factor'])
+
+        add('Fixed', 'cap_pro', process['fix-cost'])
+        add('Fixed', 'cap_tra', transmission['fix-cost'])
+        add('Fixed', 'cap_sto_p', storage['fix-cost-p'])
+        add('Fixed', 'cap_sto_c', storage['fix-cost-c'])
+
+        add('Variable', 'tau_pro', process['var-cost'] * dt * weight, True)
+        add('Variable', 'e_tra_in', transmission['var-cost'] * dt * weight,
+            True)
+        add('Variable', 'e_sto_con', storage['var-cost-c'] * weight, True)
+        add('Variable', 'e_sto_in', storage['var-cost-p'] * dt * weight, True)
+        add('Variable', 'e_sto_out', storage['var-cost-p'] * dt * weight,
+            True)
+
+        com = self.com_tuples.get_level_values('com')
+        price = p.commodity['price'].values.astype(float)
+        add('Fuel', 'e_co_stock', price * dt * weight, True,
+            com.isin(self.com_stock))
+
+        # environmental costs: - balance * weight * dt * price
+        env = np.flatnonzero(com.isin(self.com_env))
+        keys = pd.DataFrame({
+            'sit': self.com_tuples.get_level_values('sit')[env],
+            'com': com[env]})
+        self._add_balance_terms(
+            _Block(row['Environmental'], pd.Index([0])),
+            np.zeros(len(env), dtype=int), keys,
+            price[env] * weight * dt, total=True)
+
+    # Matrix
+    # ======
+
+    def _assemble(self):
+        """Merge all terms to one COO matrix without duplicate entries."""
+        rows = np.concatenate([terms[0] for terms in self._terms])
+        cols = np.concatenate([terms[1] for terms in self._terms])
+        vals = np.concatenate([terms[2] for terms in self._terms])
+        self._terms = None
+
+        order = np.lexsort((rows, cols))
+        rows, cols, vals = rows[order], cols[order], vals[order]
+        if len(rows) > 0:
+            new = np.ones(len(rows), dtype=bool)
+            new[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+            starts = np.flatnonzero(new)
+            vals = np.add.reduceat(vals, starts)
+            rows, cols = rows[starts], cols[starts]
+        nonzero = vals != 0
+        self.rows, self.cols, self.vals = (rows[nonzero], cols[nonzero],
+                                           vals[nonzero])
+
+        self.sense = np.concatenate(self._sense)
+        self.rhs = np.concatenate(self._rhs)
+        self.range = np.concatenate(self._range)
+        self.c = np.zeros(self._num_variables)
+        self.c[self._variables['costs'].pos(np.arange(len(COST_TYPES)))] = 1
+        self.lower = np.zeros(self._num_variables)
+        if self._free:
+            self.lower[np.concatenate(self._free)] = -np.inf
+        self._sense = self._rhs = self._range = None
+
+    def write(self, filename):
+        """Write the linear program to a free format MPS file.
+
+        The file is read e.g. by Gurobi, HiGHS and CBC; free columns get the
+        lower bound -1e30, which these solvers treat as minus infinity.
+        Columns are named x<column>, rows r<row>; the column and row of an
+        entity element are given by the blocks in self._variables and
+        self._constraints.
+
+        Args:
+            filename: MPS file name
+        """
+        # objective coefficients, plus a zero entry for columns without
+        # coefficients, so that every column is declared
+        declared = np.zeros(self._num_variables, dtype=bool)
+        declared[self.cols] = True
+        obj = np.flatnonzero((self.c != 0) | ~declared)
+        rows = np.concatenate([np.full(len(obj), -1), self.rows])
+        cols = np.concatenate([obj, self.cols])
+        vals = np.concatenate([self.c[obj], self.vals])
+        order = np.lexsort((rows, cols))
+
+        def row_name(row):
+            return 'obj' if row < 0 else 'r%d' % row
+
+        with open(filename, 'w') as f:
+            f.write('NAME urbs\nROWS\n N obj\n')
+            f.writelines(' %s r%d\n' % (sense, row)
+                         for row, sense in enumerate(self.sense.tolist()))
+            f.write('COLUMNS\n')
+            f.writelines(' x%d %s %r\n' % (col, row_name(row), val)
+                         for row, col, val in zip(rows[order].tolist(),
+                                                  cols[order].tolist(),
+                                                  vals[order].tolist()))
+            f.write('RHS\n')
+            rows = np.flatnonzero(self.rhs)
+            f.writelines(' rhs r%d %r\n' % entry
+                         for entry in zip(rows.tolist(),
+                                          self.rhs[rows].tolist()))
+            ranged = np.flatnonzero(np.isfinite(self.range))
+            if len(ranged) > 0:
+                f.write('RANGES\n')
+                f.writelines(' rng r%d %r\n' % entry
+                             for entry in zip(ranged.tolist(),
+                                              self.range[ranged].tolist()))
+            free = np.flatnonzero(np.isinf(self.lower))
+            if len(free) > 0:
+                # free columns get an explicit infinite lower bound: a 'FR'
+                # line without value is ambiguous in free format, and e.g.
+                # CBC reads its bound name as column name
+                f.write('BOUNDS\n')
+                f.writelines(' LO bnd x%d -1e+30\n' % col
+                             for col in free.tolist())
+            f.write('ENDATA\n')
+
+    def solve(self, tee=True, options=None):
+        """Solve the linear program with gurobipy and load the solution.
+
+        The arrays are passed to Gurobi directly, without a model file: as
+        one sparse matrix with the matrix API of gurobipy 9 and later, row
+        by row otherwise. Ranged rows become two rows.
+
+        Args:
+            tee: if True, show the solver log
+            options: optional dict of Gurobi parameters
+
+        Returns:
+            the solved gurobipy Model
+        """
+        import gurobipy
+
+        model = gurobipy.Model(self.name)
+        model.setParam('OutputFlag', int(tee))
+        for name, value in (options or {}).items():
+            model.setParam(name, value)
+
+        # rows rhs <= a * x <= rhs + range become a 'G' and an 'L' row
+        ranged = np.flatnonzero(np.isfinite(self.range))
+        upper_row = np.full(self._num_rows, -1)
+        upper_row[ranged] = self._num_rows + np.arange(len(ranged))
+        upper_terms = upper_row[self.rows] >= 0
+        rows = np.concatenate([self.rows, upper_row[self.rows[upper_terms]]])
+        cols = np.concatenate([self.cols, self.cols[upper_terms]])
+        vals = np.concatenate([self.vals, self.vals[upper_terms]])
+        senses = {'E': gurobipy.GRB.EQUAL, 'L': gurobipy.GRB.LESS_EQUAL,
+                  'G': gurobipy.GRB.GREATER_EQUAL}
+        sense = [senses[sense] for sense in self.sense.tolist()]
+        sense += [gurobipy.GRB.LESS_EQUAL] * len(ranged)
+        rhs = np.concatenate([self.rhs, self.rhs[ranged] + self.range[ranged]])
+        lower = np.where(np.isinf(self.lower), -gurobipy.GRB.INFINITY,
+                         self.lower)
+
+        if hasattr(model, 'addMConstr'):
+            import scipy.sparse
+
+            x = model.addMVar(self._num_variables, lb=lower, obj=self.c)
+            matrix = scipy.sparse.csr_matrix(
+                (vals, (rows, cols)), shape=(len(rhs), self._num_variables))
+            model.addMConstr(matrix, x, np.array(sense), rhs)
+            variables = x.tolist()
+        else:
+            variables = model.addVars(self._num_variables, lb=lower.tolist(),
+                                      obj=self.c.tolist())
+            variables = [variables[col] for col in range(self._num_variables)]
+            # addConstr(lhs, sense, rhs) of gurobipy 8 is addLConstr later
+            add_row = getattr(model, 'addLConstr', model.addConstr)
+            order = np.argsort(rows, kind='mergesort')
+            rows, cols, vals = rows[order], cols[order], vals[order]
+            bounds = np.searchsorted(rows, np.arange(len(rhs) + 1))
+            for row in range(len(rhs)):
+                begin, end = bounds[row], bounds[row + 1]
+                expr = gurobipy.LinExpr(vals[begin:end].tolist(),
+                                        [variables[col] for col in
+                                         cols[begin:end].tolist()])
+                add_row(expr, sense[row], rhs[row])
+
+        model.optimize()
+        if model.Status != gurobipy.GRB.OPTIMAL:
+            raise RuntimeError('{} not solved to optimality, Gurobi status '
+                               '{}.'.format(self.name, model.Status))
+
+        self.load_solution(model.getAttr('X', variables))
+        return model
+
+    def load_solution(self, values):
+        """Map a solution vector to the result cache of get_entity and save.
+
+        The result cache holds the sets, the parameters dt, weight and the
+        installed capacities and all variables of Normal, named and indexed
+        as get_entity returns them for a Normal model.
+
+        Args:
+            values: array of variable values, one per column
+        """
+        values = np.asarray(values, dtype=float)
+        self.objective_value = float(self.c.dot(values))
+
+        result = OrderedDict()
+        for name, index in self._set_indices():
+            result[name] = pd.Series(1, index=index, name=name)
+        result['dt'] = pd.Series([float(self.dt)], index=[None], name='dt')
+        result['weight'] = pd.Series([self.weight], index=[None],
+                                     name='weight')
+        p = self._prepared
+        for name, tuples, frame, column in [
+                ('pro_inst', self.pro_tuples, p.process, 'inst-cap'),
+                ('sto_c_inst', self.sto_tuples, p.storage, 'inst-cap-c'),
+                ('sto_p_inst', self.sto_tuples, p.storage, 'inst-cap-p'),
+                ('tra_inst', self.tra_tuples, p.transmission, 'inst-cap')]:
+            result[name] = pd.Series(frame[column].values.astype(float),
+                                     index=tuples, name=name)
+        for name, block in self._variables.items():
+            result[name] = pd.Series(
+                values[block.offset:block.offset + len(block)],
+                index=block.index(), name=name)
+        self._result = result
+
+    def _set_indices(self):
+        """Return (name, index) of the sets, labelled as by get_entity."""
+        p = self._prepared
+        commodity = p.commodity.index
+        sets = [
+            ('t', pd.Index(self.timesteps, name='t_')),
+            ('tm', pd.Index(self.timesteps[1:], name='t')),
+            ('sit', pd.Index(self.sit, name='sit_')),
+            ('com', commodity.get_level_values('Commodity').unique()
+             .rename('com_')),
+            ('com_type', commodity.get_level_values('Type').unique()
+             .rename('com_type_')),
+            ('pro', p.process.index.get_level_values('Process').unique()
+             .rename('pro_')),
+            ('tra', p.transmission.index.get_level_values('Transmission')
+             .unique().rename('tra_')),
+            ('sto', p.storage.index.get_level_values('Storage').unique()
+             .rename('sto_')),
+            ('cost_type', pd.Index(COST_TYPES, name='cost_type_'))]
+        for name in ['com_supim', 'com_stock', 'com_demand', 'com_env']:
+            sets.append((name, pd.Index(sorted(getattr(self, name)),
+                                        name='com')))
+        for name in ['com_tuples', 'pro_tuples', 'tra_tuples', 'sto_tuples',
+                     'pro_area_tuples', 'pro_input_tuples',
+                     'pro_output_tuples', 'pro_maxgrad_tuples']:
+            sets.append((name, getattr(self, name)))
+        return sets
+
+
+def _product_tuples(pro, ratio_index):
+    """Return (sit, pro, com) tuples of processes and their commodities.
+
+    Args:
+        pro: DataFrame of process tuples with columns 'sit' and 'pro'
+        ratio_index: (Process, Commodity) index of input or output ratios
+
+    Returns:
+        MultiIndex with levels 'sit', 'pro' and 'com'
+    """
+    ratios = ratio_index.to_frame(index=False)
+    ratios.columns = ['pro', 'com']
+    tuples = pro.merge(ratios, on='pro')
+    return pd.MultiIndex.from_frame(tuples[['sit', 'pro', 'com']])
@@ -1,5 +1,4 @@
 from .regional_super import *
-from ..pyomoio import get_entity
 
 
 class RegionalMaster(RegionalSuper):
@@ -88,6 +87,7 @@ class RegionalMaster(RegionalSuper):
             rule=res_global_co2_limit_rule,
             doc='total co2 commodity output <= Global CO2 limit')
 
+    @traced('add_cut')
     def add_cut(self, cut_generating_problem, sub_in_input_files):
         """Adds a cut, which is generated by a subproblem, to the master problem
 
@@ -100,57 +100,59 @@ class RegionalMaster(RegionalSuper):
                   ' (Lambda = ' + str(cut_generating_problem.Lambda()) + ')')
             return
 
+        template = self._cut_templates.get(cut_generating_problem)
+        if template is None:
+            template = self._create_cut_template(cut_generating_problem, sub_in_input_files)
+            self._cut_templates[cut_generating_problem] = template
+
+        # cut generation
+        coefficients = template.coefficients(cut_generating_problem)
+        Lambda = cut_generating_problem.Lambda()
+        cut_value = coefficients.dot(template.values(getattr(cut_generating_problem, 'cut_point', None)))
+        self.add_cut_constraint(coefficients, template.variables, Lambda + cut_value)
+
+    def _create_cut_template(self, cut_generating_problem, sub_in_input_files):
+        """Creates the CutTemplate of the cuts generated by a subproblem
+
+        Args:
+            cut_generating_problem: sub problem instance which generates the cuts
+            sub_in_input_files: If true, the cut generating problem is in the list of filenames to Excel spread sheets for sub regions
+
+        Returns:
+            the CutTemplate
+        """
+        sub = cut_generating_problem
+        site = sub.sub_site[1]
+        template = CutTemplate()
+
         # subproblem with input file
         if sub_in_input_files:
-            # dual variables
-            dual_imp = get_entity(cut_generating_problem, 'res_import')
-            dual_exp = get_entity(cut_generating_problem, 'res_export')
-            dual_cap = get_entity(cut_generating_problem, 'res_hvac')
-            dual_env = get_entity(cut_generating_problem, 'res_global_co2_limit')
-            dual_zero = cut_generating_problem.dual[cut_generating_problem.sub_costs]
-            Lambda = cut_generating_problem.Lambda()
-
-            cut_expression = - 1 * (sum([dual_imp[tm, tra[0]] * self.e_tra_in[(tm,) + tra]
-                                         for tm in self.tm
-                                         for tra in self.tra_tuples
-                                         if tra[1] == cut_generating_problem.sub_site[1]]) -
-                                    sum([dual_exp[tm, tra[1]] * self.e_tra_in[(tm,) + tra]
-                                         for tm in self.tm
-                                         for tra in self.tra_tuples
-                                         if tra[0] == cut_generating_problem.sub_site[1]]) +
-                                    sum([dual_cap[tra[0]] * self.cap_tra[tra]
-                                         for tra in self.tra_tuples
-                                         if tra[1] == cut_generating_problem.sub_site[1]]) +
-                                    sum([dual_env[0] * self.e_co_stock[(tm,) + com]
-                                         for tm in self.tm
-                                         for com in self.com_tuples
-                                         if com[0] == cut_generating_problem.sub_site[1] and com[1] in self.com_env]) +
-                                    dual_zero * self.eta[cut_generating_problem.sub_site[1]])
-
+            imports = [(tm, tra) for tm in self.tm for tra in self.tra_tuples if tra[1] == site]
+            exports = [(tm, tra) for tm in self.tm for tra in self.tra_tuples if tra[0] == site]
+            template.add([sub.res_import[tm, tra[0]] for tm, tra in imports],
+                         [self.e_tra_in[(tm,) + tra] for tm, tra in imports], -1)
+            template.add([sub.res_export[tm, tra[1]] for tm, tra in exports],
+                         [self.e_tra_in[(tm,) + tra] for tm, tra in exports], 1)
+            hvac = [tra for tra in self.tra_tuples if tra[1] == site]
+            template.add([sub.res_hvac[tra[0]] for tra in hvac],
+                         [self.cap_tra[tra] for tra in hvac], -1)
+            env = [(tm, com) for tm in self.tm for com in self.com_tuples
+                   if com[0] == site and com[1] in self.com_env]
         else:
-            # dual variables
-            dual_tra = get_entity(cut_generating_problem, 'sub_e_tra')
-            dual_env = get_entity(cut_generating_problem, 'res_global_co2_limit')
-            dual_zero = cut_generating_problem.dual[cut_generating_problem.sub_costs]
-            Lambda = cut_generating_problem.Lambda()
-
-            # cut generation
-            cut_expression = - 1 * (sum([dual_tra[(tm,) + tra] * self.e_tra_in[(tm,) + tra]
-                                         for tm in cut_generating_problem.tm
-                                         for tra in cut_generating_problem.tra_tuples
-                                         if tra[1] in cut_generating_problem.sub_site]) -
-                                    sum([dual_tra[(tm,) + tra] * self.e_tra_in[(tm,) + tra]
-                                         for tm in cut_generating_problem.tm
-                                         for tra in cut_generating_problem.tra_tuples
-                                         if tra[0] in cut_generating_problem.sub_site]) +
-                                    sum([dual_env[0] * self.e_co_stock[(tm,) + com]
-                                         for tm in cut_generating_problem.tm
-                                         for com in cut_generating_problem.com_tuples
-                                         if com[1] in cut_generating_problem.com_env]) +
-                                    dual_zero * self.eta[cut_generating_problem.sub_site[1]])
-
-        cut = cut_expression >= Lambda + cut_expression()
-        self.Cut_Defn.add(cut)
+            imports = [(tm, tra) for tm in sub.tm for tra in sub.tra_tuples if tra[1] in sub.sub_site]
+            exports = [(tm, tra) for tm in sub.tm for tra in sub.tra_tuples if tra[0] in sub.sub_site]
+            template.add([sub.sub_e_tra[(tm,) + tra] for tm, tra in imports],
+                         [self.e_tra_in[(tm,) + tra] for tm, tra in imports], -1)
+            template.add([sub.sub_e_tra[(tm,) + tra] for tm, tra in exports],
+                         [self.e_tra_in[(tm,) + tra] for tm, tra in exports], 1)
+            env = [(tm, com) for tm in sub.tm for com in sub.com_tuples if com[1] in sub.com_env]
+
+        # the CO2 limit has no dual if it is skipped (infinite limit)
+        if len(sub.res_global_co2_limit) > 0:
+            template.add([sub.res_global_co2_limit] * len(env),
+                         [self.e_co_stock[(tm,) + com] for tm, com in env], -1)
+        template.add([sub.sub_costs], [self.eta[site]], -1)
+        return template
 
 
 # RegionalMaster specific Constraints
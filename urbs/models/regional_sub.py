@@ -496,16 +496,20 @@ def sub_e_tra_rule(m, tm, sin, sout, tra, com):
 
 # Electric export restriction
 def res_export_rule(m, tm, sit_out):
-    total_exp = sum(m.e_tra_out[tm, tra] for tra in m.tra_tuples
-                    if tra[1] == sit_out)
+    total_exp = sum(m.e_tra_out[(tm,) + tra]
+                    for com in m.com
+                    for tra in m.balance_index.get((sit_out, com), {})
+                                              .get('tra_out', []))
 
     return (-total_exp <= -m.e_export_res[tm, sit_out] + m.Lambda * m.omega)
 
 
 # Electric import restriction
 def res_import_rule(m, tm, sit_out):
-    total_imp = sum(m.e_tra_in[tm, tra] for tra in m.tra_tuples
-                    if tra[0] == sit_out)
+    total_imp = sum(m.e_tra_in[(tm,) + tra]
+                    for com in m.com
+                    for tra in m.balance_index.get((sit_out, com), {})
+                                              .get('tra_in', []))
 
     return (total_imp <= m.e_import_res[tm, sit_out] + m.Lambda * m.omega)
 
@@ -1,4 +1,5 @@
 from .sddp_super import *
+from ..scenario_tree import convex_combination, with_supim
 
 
 class SddpSub(SddpSuper):
@@ -14,41 +15,36 @@ class SddpSub(SddpSuper):
         Returns:
             pandas Series or DataFrame with convex combination
         """
-        if factor < 0:
-            supim_convex = (1 - abs(factor)) * supim
-        elif factor > 0:
-            supim_convex = abs(factor) + (1 - abs(factor)) * supim
-        else:
-            supim_convex = supim
-
-        return supim_convex
+        return convex_combination(supim, factor)
 
-    def create_uncertainty_data(self, data, factor):
+    def create_uncertainty_data(self, data, factor, timesteps=None):
         """
         Change dataframe to include modified uncertain time series
 
         Args:
-            data: pandas DataFrame with original data
+            data: dict of pandas DataFrames or PreparedInput with original data
             factor: float, between -1 and 1, which corresponds to the realization of the uncertainty
+            timesteps: optional list of timesteps; only their supim time series are kept
 
         Returns:
-            pandas DataFrame with modified data
+            dict of pandas DataFrames or PreparedInput with modified data
         """
 
-        # get supim sheet
+        # get supim sheet, copying only the window of the sub
         supim = data['supim']
-        new_data = data.copy()
-        new_supim = supim.copy(deep=True)
+        if timesteps is None:
+            new_supim = supim.copy(deep=True)
+        else:
+            new_supim = supim.loc[list(timesteps)].copy()
         wind_supim = new_supim.xs('Wind', axis=1, level=1)
         help_df = self.create_uncertainty_supim(wind_supim, factor)
         help_df.columns = pd.MultiIndex.from_product([help_df.columns, ['Wind']])
         new_supim.loc[:, (slice(None), 'Wind')] = help_df
-        new_data['supim'] = new_supim
 
-        return new_data
+        return with_supim(data, new_supim)
 
     def __init__(self, data, timesteps=None, supportsteps=[], dt=1, dual=False, model_type=urbsType.sub,
-                 uncertainty_factor=0, first_timestep=0):
+                 uncertainty_factor=0, first_timestep=0, scenario_tree=None, realization=None):
         """Initiates SddpSub as a pyomo ConcreteModel urbs object from given input data.
 
         Args:
@@ -58,9 +54,15 @@ class SddpSub(SddpSuper):
             dt: timestep duration in hours (default: 1)
             dual: set True to add dual variables to model (slower); default: False
             model_type: model_type of the problem; 0: Normal(default), 1:Sub, 2: Master
+            uncertainty_factor: float, between -1 and 1, which corresponds to the realization of the uncertainty of the Wind time series
             first_timestep: The timestep at which the non decomposed problem starts. This is needed to calculate the weight parameter correctly. The default is set to 0.
+            scenario_tree: optional ScenarioTree; if given, it provides the supim time series instead of uncertainty_factor
+            realization: name of the realization of scenario_tree
         """
-        uncertainty_data = self.create_uncertainty_data(data, uncertainty_factor)
+        if scenario_tree is not None:
+            uncertainty_data = scenario_tree.data(data, realization, timesteps)
+        else:
+            uncertainty_data = self.create_uncertainty_data(data, uncertainty_factor, timesteps)
         super().__init__(uncertainty_data, timesteps, supportsteps, dt, dual, model_type, first_timestep=first_timestep)
         # Initialize sub model specific things
         self.name = 'urbs-sub' + str(timesteps[0])
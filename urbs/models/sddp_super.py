@@ -136,6 +136,10 @@ class SddpSuper(ModelSuper, ABC):
         # Cut List
         self.Cut_Defn = pyomo.ConstraintList(noruleinit=True)
 
+        # between forward passes only the incoming states and the cuts change, so that the last solution is a
+        # good start
+        self.warmstart = True
+
         # Equation declarations
         # equation bodies are defined in separate functions, referred to here by
         # their name in the "rule" keyword.
@@ -279,42 +283,50 @@ class SddpSuper(ModelSuper, ABC):
         Returns:
             the generated cut expression
         """
-        multi_index = pd.MultiIndex.from_tuples([(t,) + sto
-                                                 for t in cut_generating_problem.t
-                                                 for sto in cut_generating_problem.sto_tuples],
-                                                names=['t', 'sit', 'sto', 'com'])
-        dual_sto = pd.Series(0, index=multi_index)
-
-        dual_sto_help = get_entity(cut_generating_problem, 'sub_storage_content')
-        dual_sto = dual_sto.add(-abs(dual_sto_help.loc[[cut_generating_problem.ts[1]]]), fill_value=0)
-
-        dual_pro = get_entity(cut_generating_problem, 'def_process_capacity')
-        dual_tra = get_entity(cut_generating_problem, 'def_transmission_capacity')
-        dual_sto_cap = get_entity(cut_generating_problem, 'def_storage_capacity')
-        dual_sto_capl = get_entity(cut_generating_problem, 'def_storage_capacity_l')
-        dual_sto_pow = get_entity(cut_generating_problem, 'def_storage_power')
-        dual_com = get_entity(cut_generating_problem, 'sub_com_generation')
-        dual_zero = cut_generating_problem.dual[cut_generating_problem.sub_costs]
-
-        cut_expression = - 1 * (sum(dual_pro[pro] * self.cap_pro[pro]
-                              for pro in self.pro_tuples) +
-                          sum(dual_tra[tra] * self.cap_tra[tra]
-                              for tra in self.tra_tuples) +
-                          sum((dual_sto_cap[sto] - dual_sto_capl[sto]) * self.cap_sto_c[sto]
-                              for sto in self.sto_tuples) +
-                          sum(dual_sto_pow[sto] * self.cap_sto_p[sto]
-                              for sto in self.sto_tuples) +
-                          dual_zero * self.eta)
-
-        cut_expression += -1 * (sum([dual_sto[(self.t[-1],) + sto] * self.e_sto_con[(self.t[-1],) + sto]
-                               for sto in self.sto_tuples]) -
-                          sum([dual_com[(self.t[-1],) + com] * self.e_co_stock_state[
-                              (self.t[-1],) + com]
-                               for com in self.com_tuples if com in self.com_max_tuples])
-                          )
-
-        return cut_expression
+        template = self._get_cut_template(cut_generating_problem)
+        return linear_expression(template.coefficients(cut_generating_problem), template.variables)
+
+    def _get_cut_template(self, cut_generating_problem):
+        """
+        Returns the CutTemplate of the cuts generated by a realization, creating it on first use
+
+        Args:
+            cut_generating problem: the realization which generates the cut
 
+        Returns:
+            the CutTemplate
+        """
+        template = self._cut_templates.get(cut_generating_problem)
+        if template is not None:
+            return template
+
+        sub = cut_generating_problem
+        template = CutTemplate()
+        template.add([sub.def_process_capacity[pro] for pro in self.pro_tuples],
+                     [self.cap_pro[pro] for pro in self.pro_tuples], -1)
+        template.add([sub.def_transmission_capacity[tra] for tra in self.tra_tuples],
+                     [self.cap_tra[tra] for tra in self.tra_tuples], -1)
+        template.add([sub.def_storage_capacity[sto] for sto in self.sto_tuples],
+                     [self.cap_sto_c[sto] for sto in self.sto_tuples], -1)
+        template.add([sub.def_storage_capacity_l[sto] for sto in self.sto_tuples],
+                     [self.cap_sto_c[sto] for sto in self.sto_tuples], 1)
+        template.add([sub.def_storage_power[sto] for sto in self.sto_tuples],
+                     [self.cap_sto_p[sto] for sto in self.sto_tuples], -1)
+        template.add([sub.sub_costs], [self.eta], -1)
+
+        # the state of the last timestep is coupled to the first timestep of the realization
+        if self.t[-1] == sub.ts[1]:
+            template.add([sub.sub_storage_content[(sub.ts[1],) + sto] for sto in self.sto_tuples],
+                         [self.e_sto_con[(self.t[-1],) + sto] for sto in self.sto_tuples],
+                         1, absolute=True)
+            com_max = [com for com in self.com_tuples if com in self.com_max_tuples]
+            template.add([sub.sub_com_generation[(sub.ts[1],) + com] for com in com_max],
+                         [self.e_co_stock_state[(self.t[-1],) + com] for com in com_max], 1)
+
+        self._cut_templates[cut_generating_problem] = template
+        return template
+
+    @traced('add_cut')
     def add_cut(self, realizations, cut_generating_problems, current_realized, probabilities):
         """
         Adds a cut to this problem (in Sddp cuts can be added to both master and sub problems)
@@ -324,6 +336,9 @@ class SddpSuper(ModelSuper, ABC):
             cut_generating_problems: the realizations of the sub problem in the next timestep which generate the cut
             current_realized: realized instance of current problem
             probabilities: probabilities of realizations
+
+        Returns:
+            (coefficients, variables, rhs) of the added cut or None if all cuts were skipped
         """
         cur_probs = {}
         for cur_real in realizations:
@@ -334,12 +349,20 @@ class SddpSuper(ModelSuper, ABC):
                       '), Lambda = ' + str(cut_generating_problems[cur_real].Lambda()))
 
         if len(cur_probs) > 0:
-            self.Cut_Defn.add(
-                sum(probabilities[cur_real] * self.get_cut_expression(cur_probs[cur_real])
-                    for cur_real in cur_probs)
-                >= sum(probabilities[cur_real] *
-                       (cur_probs[cur_real].Lambda() + current_realized.get_cut_expression(cur_probs[cur_real])())
-                       for cur_real in cur_probs))
+            # the templates of all realizations (and of current_realized) list the corresponding
+            # variables in the same order, so the coefficients of one realization apply to all
+            coefficients = 0
+            cut_value = 0
+            for cur_real in cur_probs:
+                template = self._get_cut_template(cur_probs[cur_real])
+                realized_values = current_realized._get_cut_template(cur_probs[cur_real]).values()
+                real_coefficients = template.coefficients(cur_probs[cur_real])
+                coefficients = coefficients + probabilities[cur_real] * real_coefficients
+                cut_value += probabilities[cur_real] * (cur_probs[cur_real].Lambda() +
+                                                         real_coefficients.dot(realized_values))
+            self.add_cut_constraint(coefficients, template.variables, cut_value)
+            return coefficients, template.variables, cut_value
+        return None
 
 # Constraints, which are Sddp specific, but equal in Master and Subs.
 
@@ -0,0 +1,177 @@
+import pyomo.core as pyomo
+
+# capacity variables of the master problems restricted by a TrustRegion
+CAPACITY_VARIABLES = ['cap_pro', 'cap_tra', 'cap_sto_c', 'cap_sto_p']
+
+
+class TrustRegion(object):
+    """Box-step stabilization of a Benders master problem.
+
+    Plain Benders jumps between extreme capacity decisions in the first
+    iterations. A TrustRegion added to a master problem
+    (master.trust_region = TrustRegion()) restricts the capacity variables
+    of the master (cap_pro, cap_tra, cap_sto_c, cap_sto_p, as far as they
+    exist) to a box around a center:
+
+        |cap - center| <= radius * max(|center|, scale)
+
+    benders.convergence_check calls update after every iteration. The
+    center is the incumbent, i.e. the capacities with the best upper bound
+    so far. If the upper bound improves, the master solution becomes the new
+    incumbent (serious step) and the radius grows if the box was binding.
+    Otherwise the radius shrinks (null step). As long as the subs are
+    relaxed (Lambda > 0) there is no upper bound and no incumbent; the
+    master solution is then cut off by the feasibility cuts of the subs and
+    no center, so there is no box until the first feasible master solution.
+    Once the radius falls below min_radius, the box is removed and plain
+    Benders converges.
+
+    If the master is infeasible within the box anyway, ModelSuper.solve
+    relaxes the box for this solve (see relax) and solves again.
+
+    While the box is binding, the master objective is no lower bound of the
+    problem; valid_lower_bound returns the best lower bound of the optimal
+    solves in which it was not. Non-optimal solves never change the bounds
+    or the box.
+    """
+    def __init__(self, radius=0.5, scale=1.0, increase=2.0, decrease=0.5, min_radius=0.01, tolerance=1e-6):
+        """Initializes a trust region without incumbent.
+
+        Args:
+            radius: initial relative half width of the box
+            scale: minimal absolute half width of the box per unit of radius, for capacities near zero
+            increase: factor of the radius after a serious step with binding box or an infeasible boxed master
+            decrease: factor of the radius after a null step
+            min_radius: the box is removed when the radius falls below it
+            tolerance: relative tolerance of the improvement and of binding bounds
+        """
+        self.radius = radius
+        self.scale = scale
+        self.increase = increase
+        self.decrease = decrease
+        self.min_radius = min_radius
+        self.tolerance = tolerance
+        self.active = True
+        self.incumbent = None
+        self.center = None
+        self.best_upper_bound = float('inf')
+        self.lower_bound = -float('inf')
+        # id(variable) -> original (lb, ub)
+        self._bounds = {}
+
+    def valid_lower_bound(self, problem):
+        """Returns the best valid lower bound after a solve of problem.
+
+        Args:
+            problem: the solved master problem
+
+        Returns:
+            the master objective if the solve was optimal and the box is not
+            binding, else the best lower bound of the previous iterations
+        """
+        if problem.optimal is not False and not self._binding(problem):
+            self.lower_bound = max(self.lower_bound, problem.obj())
+        return self.lower_bound
+
+    def update(self, problem, upper_bound):
+        """Moves the incumbent and adapts the radius after an iteration.
+
+        Args:
+            problem: the solved master problem
+            upper_bound: upper bound of the current master solution, inf if
+                the subs are infeasible for it
+
+        Returns:
+            True for a serious step, False for a null step
+        """
+        if not self.active or problem.optimal is False:
+            return False
+        binding = self._binding(problem)
+        values = dict((id(var), var.value) for var in _capacity_variables(problem))
+        serious = upper_bound < float('inf') and (
+            self.incumbent is None or
+            upper_bound < self.best_upper_bound - self.tolerance * abs(self.best_upper_bound))
+        if serious:
+            if binding:
+                self.radius *= self.increase
+            self.best_upper_bound = upper_bound
+            self.incumbent = values
+            self.center = values
+        elif self.incumbent is None:
+            # the feasibility cuts exclude the master solution, no box yet
+            return False
+        else:
+            self.radius *= self.decrease
+
+        if self.radius < self.min_radius:
+            self.remove(problem)
+        else:
+            self._set_bounds(problem)
+        return serious
+
+    def relax(self, problem):
+        """Restores the original bounds after the master was infeasible within
+        the box, and widens the box for the next iterations.
+
+        Args:
+            problem: the master problem
+
+        Returns:
+            True if a box was set, i.e. solving again may help
+        """
+        if not self._bounds:
+            return False
+        self._restore_bounds(problem)
+        self.radius *= self.increase
+        return True
+
+    def remove(self, problem):
+        """Restores the original bounds of the capacity variables of problem.
+
+        Args:
+            problem: the master problem
+        """
+        self._restore_bounds(problem)
+        self.active = False
+
+    def _restore_bounds(self, problem):
+        """ Reset the capacity variables of problem to their bounds without box """
+        for var in _capacity_variables(problem):
+            if id(var) in self._bounds:
+                var.setlb(self._bounds[id(var)][0])
+                var.setub(self._bounds[id(var)][1])
+                problem._changed_vars.append(var)
+        self._bounds = {}
+
+    def _set_bounds(self, problem):
+        """ Set the bounds of the capacity variables to the box around the center """
+        for var in _capacity_variables(problem):
+            lb, ub = self._bounds.setdefault(id(var), (var.lb, var.ub))
+            center = self.center[id(var)] or 0.0
+            width = self.radius * max(abs(center), self.scale)
+            var.setlb(center - width if lb is None else max(lb, center - width))
+            var.setub(center + width if ub is None else min(ub, center + width))
+            problem._changed_vars.append(var)
+
+    def _binding(self, problem):
+        """ Return True if a capacity variable is at a bound set by the box """
+        for var in _capacity_variables(problem):
+            if id(var) not in self._bounds or var.value is None:
+                continue
+            lb, ub = self._bounds[id(var)]
+            tolerance = self.tolerance * max(1, abs(var.value))
+            if var.lb is not None and var.lb != lb and var.value <= var.lb + tolerance:
+                return True
+            if var.ub is not None and var.ub != ub and var.value >= var.ub - tolerance:
+                return True
+        return False
+
+
+def _capacity_variables(problem):
+    """ Return the data objects of the capacity variables of problem """
+    variables = []
+    for name in CAPACITY_VARIABLES:
+        entity = getattr(problem, name, None)
+        if isinstance(entity, pyomo.Var):
+            variables.extend(entity[i] for i in entity)
+    return variables
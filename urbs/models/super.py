@@ -1,7 +1,13 @@
 from enum import Enum
+import weakref
+import numpy as np
 import pandas as pd
 from ..pyomoio import get_entity, _get_onset_names
+from ..tracing import span, traced
 import pyomo.core as pyomo
+from pyomo.solvers.plugins.solvers.persistent_solver import PersistentSolver
+from pyomo.opt import TerminationCondition
+from collections import OrderedDict
 from datetime import datetime
 from ..input import *
 from abc import ABC, abstractmethod
@@ -23,7 +29,8 @@ class ModelSuper(pyomo.ConcreteModel, ABC):
 
         Args:
             data: a dict of 6 DataFrames with the keys 'commodity', 'process',
-                'transmission', 'storage', 'demand' and 'supim'.
+                'transmission', 'storage', 'demand' and 'supim', or a
+                PreparedInput of it shared by several problems.
             timesteps: optional list of timesteps, default: demand timeseries
             dt: timestep duration in hours (default: 1)
             dual: set True to add dual variables to model (slower); default: False
@@ -45,80 +52,48 @@ class ModelSuper(pyomo.ConcreteModel, ABC):
         #
         #     self.storage.loc[site, storage, commodity][attribute]
         #
-        if site in data['site'].index:
-            self.global_prop = data['global_prop'].drop('description', axis=1)
-            self.site = data['site'].loc[[site]]
-            self.commodity = data['commodity'].loc[[site]]
-            self.process = data['process'].loc[[site]]
-            self.process_commodity = data['process_commodity']
-            self.transmission = data['transmission'].loc[
-                (data['transmission'].index.get_level_values('Site In') == site) |
-                (data['transmission'].index.get_level_values('Site Out') == site)]
-            self.storage = data['storage'].loc[[site]]
-            self.demand = data['demand'][[site]]
-            self.supim = data['supim'][[site]]
-            self.timesteps = timesteps
-        else:
-            self.global_prop = data['global_prop'].drop('description', axis=1)
-            self.site = data['site']
-            self.commodity = data['commodity']
-            self.process = data['process']
-            self.process_commodity = data['process_commodity']
-            self.transmission = data['transmission']
-            self.storage = data['storage']
-            self.demand = data['demand']
-            self.supim = data['supim']
-            self.timesteps = timesteps
-
-        # Converting Data frames to dict
-        self.commodity_dict = self.commodity.to_dict()
-        self.demand_dict = self.demand.to_dict()
-        self.supim_dict = self.supim.to_dict()
-
-        # process input/output ratios
-        self.r_in = self.process_commodity.xs('In', level='Direction')['ratio']
-        self.r_out = self.process_commodity.xs('Out', level='Direction')['ratio']
-        self.r_in_dict = self.r_in.to_dict()
-        self.r_out_dict = self.r_out.to_dict()
-
-        # process areas
-        self.proc_area = self.process['area-per-cap']
-        self.sit_area = self.site['area']
-        self.proc_area = self.proc_area[self.proc_area >= 0]
-        self.sit_area = self.sit_area[self.sit_area >= 0]
-
-        # input ratios for partial efficiencies
-        # only keep those entries whose values are
-        # a) positive and
-        # b) numeric (implicitely, as NaN or NV compare false against 0)
-        self.r_in_min_fraction = self.process_commodity.xs('In', level='Direction')
-        self.r_in_min_fraction = self.r_in_min_fraction['ratio-min']
-        self.r_in_min_fraction = self.r_in_min_fraction[self.r_in_min_fraction > 0]
-
-        # output ratios for partial efficiencies
-        # only keep those entries whose values are
-        # a) positive and
-        # b) numeric (implicitely, as NaN or NV compare false against 0)
-        self.r_out_min_fraction = self.process_commodity.xs('Out', level='Direction')
-        self.r_out_min_fraction = self.r_out_min_fraction['ratio-min']
-        self.r_out_min_fraction = self.r_out_min_fraction[self.r_out_min_fraction > 0]
-
-        # derive annuity factor from WACC and depreciation duration
-        pd.set_option('mode.chained_assignment', None)  # Remove SettingWithCopyError Warning
-        self.process['annuity-factor'] = annuity_factor(
-            self.process['depreciation'],
-            self.process['wacc'])
-        self.transmission['annuity-factor'] = annuity_factor(
-            self.transmission['depreciation'],
-            self.transmission['wacc'])
-        self.storage['annuity-factor'] = annuity_factor(
-            self.storage['depreciation'],
-            self.storage['wacc'])
-
-        # Converting Data frames to dictionaries
-        self.process_dict = self.process.to_dict()
-        self.transmission_dict = self.transmission.to_dict()
-        self.storage_dict = self.storage.to_dict()
+        # The preprocessing of the input is shared by all problems built from
+        # the same PreparedInput; here, only its members are referenced.
+        with span('build.input'):
+            regional = site in data['site'].index
+            if not isinstance(data, PreparedInput):
+                # slice by site first, as for a single problem nothing is shared
+                prepared = PreparedInput(data, site if regional else None)
+            elif regional and data.site_name != site:
+                prepared = data.for_site(site)
+            else:
+                prepared = data
+        data = prepared.data
+
+        self.global_prop = prepared.global_prop
+        self.site = prepared.site
+        self.commodity = prepared.commodity
+        self.process = prepared.process
+        self.process_commodity = prepared.process_commodity
+        self.transmission = prepared.transmission
+        self.storage = prepared.storage
+        self.demand = prepared.demand
+        self.supim = prepared.supim
+        self.timesteps = timesteps
+
+        self.commodity_dict = prepared.commodity_dict
+        self.demand_dict = prepared.demand_dict
+        self.supim_dict = prepared.supim_dict
+
+        self.r_in = prepared.r_in
+        self.r_out = prepared.r_out
+        self.r_in_dict = prepared.r_in_dict
+        self.r_out_dict = prepared.r_out_dict
+
+        self.proc_area = prepared.proc_area
+        self.sit_area = prepared.sit_area
+
+        self.r_in_min_fraction = prepared.r_in_min_fraction
+        self.r_out_min_fraction = prepared.r_out_min_fraction
+
+        self.process_dict = prepared.process_dict
+        self.transmission_dict = prepared.transmission_dict
+        self.storage_dict = prepared.storage_dict
 
         self.created = datetime.now().strftime('%Y%m%dT%H%M')
         self._data = data
@@ -274,6 +249,10 @@ class ModelSuper(pyomo.ConcreteModel, ABC):
             initialize=commodity_subset(self.com_tuples, 'Env'),
             doc='Commodities that (might) have a maximum creation limit')
 
+        # process, transmission and storage tuples adjacent to each
+        # (site, commodity), used by commodity_balance
+        self.balance_index = commodity_balance_index(self)
+
         # Parameters
 
         # dt = spacing between timesteps. Required for storage equation that
@@ -371,11 +350,191 @@ class ModelSuper(pyomo.ConcreteModel, ABC):
         if dual:
             self.dual = pyomo.Suffix(direction=pyomo.Suffix.IMPORT)
 
+        # state of a persistent solver holding this model, see solve
+        self._persistent_cuts = set()
+        self._changed_bounds = set()
+        self._changed_vars = []
+        self._dependents = None
+
+        # CutTemplates of the cuts added to this problem, per cut generating
+        # problem
+        self._cut_templates = weakref.WeakKeyDictionary()
+
+        # optional CutPool managing Cut_Defn, see add_cut_constraint
+        self.cut_pool = None
+
+        # optional TrustRegion of a master problem, see
+        # benders.convergence_check
+        self.trust_region = None
+        # whether the last solve was optimal, see solve
+        self.optimal = None
+
+        # pass the last solution to the solver as start, see solve
+        self.warmstart = False
+        # whether the model has discrete variables, see _has_discrete_variables
+        self._discrete = None
+
+    def add_component(self, name, val):
+        """ Add and construct a component, recorded as span 'build.<kind>' when tracing """
+        with span('build.' + _component_kind(val), component=name):
+            super().add_component(name, val)
+
+    @traced('solve')
     def solve(self, optim):
+        """Solves the pyomo model and returns the result.
+
+        A persistent solver, e.g. SolverFactory('gurobi_persistent'), keeps
+        the model between calls: it is sent to the solver on the first call
+        only. Later calls push the cuts added to, deactivated or reactivated
+        in Cut_Defn since and re-add only the constraints depending on
+        entities changed by set_boundaries and the bounds changed by a
+        trust region, so that the solver warm starts from its previous
+        basis. Use one persistent solver per problem; appsi solvers detect
+        these changes on their own.
+
+        With a cut pool, the cut ages are updated after the solve and the
+        problem is solved again as long as deactivated cuts are violated.
+
+        If the box of a trust region makes the problem infeasible, the box is
+        relaxed (see TrustRegion.relax) and the problem is solved again.
+        self.optimal tells whether the last solve was optimal.
+
+        If self.warmstart is set, the solution of the previous solve, which
+        stays in the model, is reused as start. For problems with discrete
+        variables, it is passed to solvers supporting it as MIP start. LPs
+        are not passed a MIP start, which solvers ignore for them and which
+        shell solvers would write to a start file at every solve. A
+        persistent solver keeps its LP basis anyway; when a new
+        'gurobi_persistent' gets this problem with a previous solution, the
+        primal and dual values are passed to the Gurobi model as LP start
+        (PStart, DStart). Other new persistent solvers start from scratch.
+
+        Args:
+            optim: a Pyomo solver, e.g. SolverFactory('gurobi') or
+                SolverFactory('gurobi_persistent')
+
+        Returns:
+            the solver results
         """
-        Solves the pyomo model and returns the result
+        result = self._solve(optim)
+        if (self.trust_region is not None and not _optimal(result) and
+                self.trust_region.relax(self)):
+            result = self._solve(optim)
+        while self.cut_pool is not None and self.cut_pool.update(self) > 0:
+            result = self._solve(optim)
+        self.optimal = _optimal(result)
+        return result
+
+    def _solve(self, optim):
+        """ Solve once with optim, see solve """
+        warmstart = (self.warmstart and _warm_start_capable(optim) and
+                     self._has_discrete_variables())
+        if not isinstance(optim, PersistentSolver):
+            self._changed_vars = []
+            if warmstart:
+                return optim.solve(self, tee=False, warmstart=True)
+            return optim.solve(self, tee=False)
+
+        if getattr(optim, '_pyomo_model', None) is not self:
+            optim.set_instance(self)
+            self._persistent_cuts = self._active_cuts()
+            self._changed_bounds = set()
+            self._changed_vars = []
+            if self.warmstart:
+                self._set_lp_start(optim)
+        else:
+            self._update_persistent(optim)
+        if warmstart:
+            return optim.solve(tee=False, warmstart=True)
+        return optim.solve(tee=False)
+
+    def _has_discrete_variables(self):
+        """ Return True if the model has integer or binary variables """
+        if self._discrete is None:
+            self._discrete = any(not var.is_continuous() for var in
+                                 self.component_data_objects(pyomo.Var))
+        return self._discrete
+
+    def _set_lp_start(self, optim):
+        """ Pass the previous primal and dual solution to a new
+        'gurobi_persistent' as LP start.
+
+        Args:
+            optim: a Pyomo persistent solver holding this model
+        """
+        # set_var_attr and set_linear_constraint_attr are missing in older
+        # Pyomo versions, so the gurobipy objects are used directly
+        if 'gurobi' not in type(optim).__name__.lower():
+            return
+        var_map = optim._pyomo_var_to_solver_var_map
+        for var in self.component_data_objects(pyomo.Var, active=True):
+            if var.value is not None and not var.fixed and var in var_map:
+                var_map[var].setAttr('PStart', var.value)
+        duals = getattr(self, 'dual', None)
+        if duals is None:
+            return
+        con_map = optim._pyomo_con_to_solver_con_map
+        for con in self.component_data_objects(pyomo.Constraint, active=True):
+            if con in duals and con in con_map:
+                con_map[con].setAttr('DStart', duals[con])
+
+    def _active_cuts(self):
+        """ Return the set of indices of the active cuts in Cut_Defn """
+        cuts = getattr(self, 'Cut_Defn', None)
+        if cuts is None:
+            return set()
+        return set(k for k in cuts if cuts[k].active)
+
+    def add_cut_constraint(self, coefficients, variables, rhs):
+        """ Add the cut sum(coefficients * variables) >= rhs to Cut_Defn.
+
+        If a cut_pool is set, it decides whether the cut is added.
+
+        Args:
+            coefficients: array of coefficients
+            variables: list of variable data objects, aligned with coefficients
+            rhs: right hand side of the cut
+        """
+        if self.cut_pool is not None:
+            self.cut_pool.add(self, coefficients, variables, rhs)
+        else:
+            self.Cut_Defn.add(linear_expression(coefficients, variables) >= rhs)
+
+    def _update_persistent(self, optim):
+        """ Push the changes since the last solve to a persistent solver.
+
+        Args:
+            optim: a Pyomo persistent solver holding this model
         """
-        return optim.solve(self, tee=False)
+        # new, deactivated and reactivated cuts
+        active = self._active_cuts()
+        for k in sorted(self._persistent_cuts - active):
+            optim.remove_constraint(self.Cut_Defn[k])
+        for k in sorted(active - self._persistent_cuts):
+            optim.add_constraint(self.Cut_Defn[k])
+        self._persistent_cuts = active
+
+        # variable bounds
+        for var in OrderedDict((id(var), var) for var in self._changed_vars).values():
+            optim.update_var(var)
+        self._changed_vars = []
+
+        if not self._changed_bounds:
+            return
+        if self._dependents is None:
+            self._dependents = _dependents_of_components(self)
+        changed = OrderedDict()
+        for name in self._changed_bounds:
+            for obj in self._dependents.get(name, []):
+                changed[id(obj)] = obj
+        for obj in changed.values():
+            if isinstance(obj.parent_component(), pyomo.Objective):
+                optim.set_objective(obj)
+            else:
+                # mutable coefficients and bounds are updated by re-adding
+                optim.remove_constraint(obj)
+                optim.add_constraint(obj)
+        self._changed_bounds = set()
 
     def get_attribute(self, name):
         """ Get attribute name
@@ -431,28 +590,35 @@ class ModelSuper(pyomo.ConcreteModel, ABC):
 
         # retrieve master entity, and it's index
         entity = master.__getattribute__(name)
-        index_entity = entity._index
+        self.set_boundary_values(bound_name, dict((i, entity[i]()) for i in entity._index))
 
-        # retrieve self entity, and it's index
-        entity_bound = self.__getattribute__(bound_name)
-        index_bound = entity_bound._index
+    def set_boundary_values(self, bound_name, values):
+        """ Set Boundaries to an entity in self from given values.
 
-        # if indices of entities do not match,
-        # try putting boundaries to same indices
-        if index_entity != index_bound:
-            for i in index_entity:
-                try:
-                    entity_bound[i].expr = entity[i]()
-                except AttributeError:
-                    entity_bound[i] = entity[i]()
-                except KeyError:
-                    pass
-        else:
-            for i in index_entity:
+        Like set_boundaries, but with the values of the master entity instead
+        of the master problem, e.g. when they were sent to another process.
+        Indices which are not in the bound entity are ignored.
+
+        Args:
+            bound_name: name of an Expression or mutable Param
+            values: dict of the values of the master entity per index
+
+        Returns:
+            None
+        """
+        with span('set_boundaries', problem=self.name, bound_name=bound_name):
+            # retrieve self entity, and it's index
+            entity_bound = self.__getattribute__(bound_name)
+            self._changed_bounds.add(bound_name)
+            index_bound = entity_bound._index
+
+            for i, value in values.items():
+                if i not in index_bound:
+                    continue
                 try:
-                    entity_bound[i].expr = entity[i]()
+                    entity_bound[i].expr = value
                 except AttributeError:
-                    entity_bound[i] = entity[i]()
+                    entity_bound[i] = value
 
     # TODO: So far this function is never used
     def get_duals(self, name, const):
@@ -527,6 +693,164 @@ class ModelSuper(pyomo.ConcreteModel, ABC):
             raise TypeError("Cannot get duals from '{}'".format(const))
 
 
+class CutTemplate(object):
+    """Positions of the duals and variables of the cuts of one sub problem.
+
+    Built once per pair of cut receiving and cut generating problem, it lists
+    the constraints of the cut generating problem whose duals enter a cut
+    and, for each of them, the variable of the receiving problem the dual
+    multiplies. A cut is then created from one pass over the dual suffix
+    into an array, without get_entity or pandas, as a single linear
+    expression.
+    """
+    def __init__(self):
+        self.constraints = []
+        self.variables = []
+        self._positions = []
+        self._factors = []
+        self._absolute = []
+        self._ids = {}
+
+    def add(self, constraints, variables, factor=1.0, absolute=False):
+        """Add cut terms factor * dual(constraint) * variable.
+
+        Args:
+            constraints: list of constraint data objects of the cut
+                generating problem; scalar constraints may be repeated
+            variables: list of variable data objects of the receiving
+                problem, one per constraint
+            factor: factor of the terms
+            absolute: if True, use the absolute values of the duals
+        """
+        for constraint, variable in zip(constraints, variables):
+            if id(variable) not in self._ids:
+                self._ids[id(variable)] = len(self.variables)
+                self.variables.append(variable)
+            self.constraints.append(constraint)
+            self._positions.append(self._ids[id(variable)])
+            self._factors.append(factor)
+            self._absolute.append(absolute)
+
+    def coefficients(self, problem):
+        """Return the cut coefficients of all variables.
+
+        Args:
+            problem: the solved cut generating problem with a dual suffix
+
+        Returns:
+            array of coefficients, aligned with self.variables
+        """
+        if hasattr(problem.dual, 'request'):
+            # duals of a parallelization.RemoteProblem, fetched in one call
+            problem.dual.request(self.constraints)
+        duals = np.fromiter((problem.dual[con] for con in self.constraints),
+                            dtype=float, count=len(self.constraints))
+        absolute = np.asarray(self._absolute, dtype=bool)
+        duals[absolute] = np.abs(duals[absolute])
+        return np.bincount(np.asarray(self._positions, dtype=int),
+                           weights=duals * np.asarray(self._factors),
+                           minlength=len(self.variables))
+
+    def values(self, point=None):
+        """Return the values of self.variables as array.
+
+        Args:
+            point: optional dict {component name: {index: value}} of the
+                values for which the cut generating problem was solved, e.g.
+                parallelization.RemoteProblem.cut_point; variables of other
+                components take their current value
+
+        Returns:
+            array of values, aligned with self.variables
+        """
+        if point is None:
+            return np.fromiter((var.value for var in self.variables),
+                               dtype=float, count=len(self.variables))
+        values = []
+        for var in self.variables:
+            component = point.get(var.parent_component().local_name)
+            values.append(var.value if component is None
+                          else component[var.index()])
+        return np.array(values, dtype=float)
+
+
+def linear_expression(coefficients, variables):
+    """ Return sum(coefficients * variables) as a single linear expression.
+
+    Args:
+        coefficients: array of coefficients
+        variables: list of variable data objects, aligned with coefficients
+
+    Returns:
+        a linear expression without the terms with zero coefficient
+    """
+    # quicksum builds a LinearExpression on all supported Pyomo versions,
+    # whose constructor signature differs between them
+    nonzero = np.flatnonzero(coefficients)
+    return pyomo.quicksum(float(coefficients[k]) * variables[k] for k in nonzero)
+
+
+def _optimal(result):
+    """ Return True if the solver result reports an optimal solution """
+    solver = getattr(result, 'solver', None)
+    if solver is None:
+        return True
+    return solver.termination_condition == TerminationCondition.optimal
+
+
+def _warm_start_capable(optim):
+    """ Return True if optim accepts a start vector via solve(warmstart=True) """
+    capable = getattr(optim, 'warm_start_capable', None)
+    return capable is not None and capable()
+
+
+def _component_kind(component):
+    """ Return the kind of a Pyomo component, e.g. 'constraint' """
+    for kind, cls in [('set', pyomo.Set), ('param', pyomo.Param), ('var', pyomo.Var),
+                      ('constraint', pyomo.Constraint), ('expression', pyomo.Expression),
+                      ('objective', pyomo.Objective)]:
+        if isinstance(component, cls):
+            return kind
+    return 'other'
+
+
+def _dependents_of_components(m):
+    """ Map Expressions and mutable Params to the constraints using them.
+
+    Args:
+        m: a Pyomo ConcreteModel instance
+
+    Returns:
+        a dict with component names as keys and lists of the constraint and
+        objective data objects that contain them (directly or nested in named
+        expressions) as values
+    """
+    dependents = {}
+    for component_type in (pyomo.Constraint, pyomo.Objective):
+        for obj in m.component_data_objects(component_type, active=True):
+            for name in _expression_components(obj.expr):
+                dependents.setdefault(name, []).append(obj)
+    return dependents
+
+
+def _expression_components(expr):
+    """ Return the names of named Expressions and Params in an expression """
+    names = set()
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if not hasattr(node, 'is_expression_type'):
+            # number
+            continue
+        if node.is_named_expression_type() or node.is_parameter_type():
+            names.add(node.parent_component().name)
+        if node.is_expression_type():
+            stack.extend(node.args)
+            # coefficients of linear expressions are not in their args
+            stack.extend(getattr(node, 'linear_coefs', ()))
+    return names
+
+
 # Constraints which are the same for all decomposition methods
 
 # commodity
@@ -3,6 +3,7 @@
 import time
 import sys
 import io
+from collections import OrderedDict
 
 
 
@@ -237,3 +238,384 @@ def parallel_processes(f,argslist):
     for p in process_list:
         p.join()
 
+
+
+# sub problems owned by this process, if it is a worker of a SubProblemPool
+_worker_problems = {}
+
+
+class SubProblemPool(object):
+    """
+    Solves sub problems in long-lived local worker processes, without Pyro.
+
+    Each sub problem is created once in a worker process and stays there. Per iteration only the boundary values
+    of the master problem are sent to the workers, and only the objective, Lambda, the costs and the duals needed
+    for the cuts are sent back. The master problem accesses the sub problems through proxies (see RemoteProblem),
+    which support the cut generation (add_cut, add_cuts) and convergence_check.
+
+    solve waits for all sub problems. For asynchronous Benders, submit and wait let the master problem proceed as
+    soon as a fraction of the sub problems returned; the cuts of the others are added when they arrive. Each
+    RemoteProblem keeps the master values it was solved for (cut_point), so that its cut is taken at the right
+    point. The upper bound of convergence_check is only valid if all sub problems were solved for the same master
+    solution, see synchronized.
+
+    Example:
+        >>> subs = {t: (urbs.DivideTimestepsSub, (data, range(t, t + 25), supportsteps), {}) for t in ...}
+        >>> with SubProblemPool(subs, 'gurobi', number_of_workers=4) as pool:
+        >>>     for i in range(max_iterations):
+        >>>         master.solve(optim)
+        >>>         pool.solve(master, [('cap_pro', 'pro_inst'), ('cap_tra', 'tra_inst'), ...])
+        >>>         master.add_cuts(pool.problems.values())
+
+        Asynchronous, synchronizing every 5th iteration:
+
+        >>>         master.solve(optim)
+        >>>         if i % 5 == 0:
+        >>>             master.add_cuts(pool.wait(1.0))  # cuts of the stragglers
+        >>>         pool.submit(master, boundaries)
+        >>>         master.add_cuts(pool.wait(1.0 if i % 5 == 0 else 0.5))
+        >>>         if pool.synchronized():
+        >>>             gap, lower_bound, upper_bound = convergence_check(master, pool.problems, upper_bound, 0, method)
+
+        SDDP backward pass, solving the realizations of a stage in parallel. The workers hold copies of the stage
+        problems (keys (stage, realization)) and return only the duals of the cuts; the probability-weighted cut is
+        added to the local problems and mirrored to the copies in the workers:
+
+        >>>     for stage in reversed(stages[1:]):
+        >>>         keys = [(stage, realization) for realization in realizations]
+        >>>         problems = pool.solve(realized[stage - 1], sddp_boundaries, keys)
+        >>>         cut_generating_problems = {key[1]: problem for key, problem in problems.items()}
+        >>>         for realization in realizations:
+        >>>             receiving = stage_problems[stage - 1, realization]
+        >>>             cut = receiving.add_cut(realizations, cut_generating_problems, realized[stage - 1],
+        >>>                                     probabilities)
+        >>>             if cut is not None and (stage - 1, realization) in pool.problems:
+        >>>                 pool.add_cut_constraint((stage - 1, realization), *cut)
+    """
+    def __init__(self, subs, solver, solver_options=None, number_of_workers=None):
+        """
+        Starts the worker processes and creates the sub problems in them.
+
+        Args:
+            subs: dict of sub problem keys to tuples (model class, args, kwargs); the sub problem is created as
+                model class(*args, **kwargs) in a worker. Sub problems must have dual=True to generate cuts.
+            solver: name of the solver, e.g. 'gurobi'
+            solver_options: optional dict of solver options
+            number_of_workers: number of worker processes. Default value is the number of cores, at most the
+                number of sub problems.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        if number_of_workers is None:
+            from multiprocessing import cpu_count
+            number_of_workers = cpu_count()
+        number_of_workers = max(1, min(number_of_workers, len(subs)))
+
+        # one executor with a single process per worker, so that every call for a sub problem reaches the
+        # process which owns it
+        self._executors = [ProcessPoolExecutor(max_workers=1) for _ in range(number_of_workers)]
+        self._owner = {}
+        futures = []
+        for k, (key, (cls, args, kwargs)) in enumerate(subs.items()):
+            self._owner[key] = self._executors[k % number_of_workers]
+            futures.append(self._owner[key].submit(
+                _worker_create, key, cls, args, kwargs, solver, solver_options or {}))
+        names = [future.result() for future in futures]
+        self.problems = OrderedDict((key, RemoteProblem(self, key, name)) for key, name in zip(subs, names))
+        # running solves per sub problem key and number of submitted master solutions
+        self._running = OrderedDict()
+        self._round = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def solve(self, master, boundaries, keys=None):
+        """
+        Sets the boundaries of the sub problems from the master problem and solves them in parallel.
+
+        Args:
+            master: the solved master problem
+            boundaries: list of (name, bound_name) pairs, see ModelSuper.set_boundaries
+            keys: optional list of the keys of the sub problems to solve, default: all
+
+        Returns:
+            dict of the RemoteProblem proxies of the solved sub problems
+        """
+        self.wait(1.0)
+        self.submit(master, boundaries, keys)
+        self.wait(1.0)
+        if keys is None:
+            return self.problems
+        return OrderedDict((key, self.problems[key]) for key in keys)
+
+    def submit(self, master, boundaries, keys=None):
+        """
+        Starts solving all sub problems which are not running with the boundaries of the master problem and
+        returns without waiting.
+
+        Args:
+            master: the solved master problem
+            boundaries: list of (name, bound_name) pairs, see ModelSuper.set_boundaries
+            keys: optional list of the keys of the sub problems to solve, default: all
+
+        Returns:
+            the number of sub problems which were started
+        """
+        point = OrderedDict((name, dict((i, getattr(master, name)[i]()) for i in getattr(master, name)._index))
+                            for name, _ in boundaries)
+        values = [(bound_name, point[name]) for name, bound_name in boundaries]
+        self._round += 1
+        started = 0
+        for key, problem in self.problems.items():
+            if key in self._running or (keys is not None and key not in keys):
+                continue
+            future = self._owner[key].submit(_worker_solve, key, values, list(problem._dual_keys))
+            self._running[key] = (future, self._round, point)
+            started += 1
+        return started
+
+    def wait(self, fraction=1.0):
+        """
+        Waits until at least a fraction of all sub problems is not running anymore.
+
+        Args:
+            fraction: fraction of the sub problems, 1.0 waits for all
+
+        Returns:
+            list of the RemoteProblem proxies with new results since the last call
+        """
+        from concurrent.futures import wait, FIRST_COMPLETED
+        import math
+        needed = math.ceil(fraction * len(self.problems))
+        while self._running and len(self.problems) - len(self._running) < needed:
+            wait([future for future, _, _ in self._running.values()], return_when=FIRST_COMPLETED)
+            self._collect()
+        self._collect()
+        finished = [problem for problem in self.problems.values() if problem._new]
+        for problem in finished:
+            problem._new = False
+        return finished
+
+    def synchronized(self):
+        """
+        Returns True if no sub problem is running and all were solved for the last submitted master solution,
+        i.e. the costs of the sub problems form an upper bound together with that master solution.
+        """
+        return not self._running and all(problem.round == self._round for problem in self.problems.values())
+
+    def _collect(self):
+        """ Store the results of all finished solves in their RemoteProblem """
+        for key, (future, number, point) in list(self._running.items()):
+            if future.done():
+                del self._running[key]
+                self.problems[key]._update(future.result(), number, point)
+
+    def call(self, key, function, *args):
+        """
+        Calls function(sub problem, *args) in the worker owning a sub problem and returns the result.
+
+        Args:
+            key: key of the sub problem
+            function: a picklable (module level) function
+            args: further arguments of function
+
+        Returns:
+            the result of function
+        """
+        return self._owner[key].submit(_worker_call, key, function, args).result()
+
+    def add_cut_constraint(self, key, coefficients, variables, rhs):
+        """
+        Adds the cut sum(coefficients * variables) >= rhs, which was added to a local problem, to the sub problem
+        of a worker, e.g. to keep its copy of an SDDP stage problem in sync. The variables are matched by component
+        name and index.
+
+        Args:
+            key: key of the sub problem
+            coefficients: array of coefficients
+            variables: list of variable data objects of the local problem, aligned with coefficients
+            rhs: right hand side of the cut
+        """
+        terms = [(var.parent_component().local_name, var.index()) for var in variables]
+        self.call(key, _add_cut_constraint, terms, list(coefficients), rhs)
+
+    def shutdown(self):
+        """
+        Shuts the worker processes down.
+        """
+        for executor in self._executors:
+            executor.shutdown()
+        self._executors = []
+
+
+class RemoteProblem(object):
+    """
+    Proxy of a sub problem owned by a worker of a SubProblemPool.
+
+    Sets of the sub problem are fetched once from the worker and indexed like Pyomo sets (starting at 1).
+    Constraints are represented by keys, whose duals are available after solving through the dual attribute;
+    Lambda and costs return the values of the last solve.
+    """
+    def __init__(self, pool, key, name):
+        self._pool = pool
+        self._key = key
+        self.name = name
+        self._dual_keys = []
+        self._components = {}
+        self.dual = {}
+        self._lambda = None
+        self.costs = {}
+        self.cost_type = []
+        # master solution of the last solve and its number, see SubProblemPool.submit
+        self.cut_point = None
+        self.round = 0
+        self._new = False
+
+    def __str__(self):
+        return self.name
+
+    def __getattr__(self, name):
+        # only called for attributes which are not set in __init__: components of the sub problem
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self._components:
+            self._components[name] = self._pool.call(self._key, _describe_component, name)
+        return self._components[name]
+
+    def Lambda(self):
+        return self._lambda
+
+    def _update(self, result, number, point):
+        """ Store the results of a solve, see _worker_solve """
+        self.round = number
+        self.cut_point = point
+        self._new = True
+        self._lambda = result['Lambda']
+        self.cost_type = list(result['costs'])
+        self.costs = dict((ct, _Value(value)) for ct, value in result['costs'].items())
+        self.dual = _RemoteDuals(self, dict(zip(self._dual_keys, result['duals'])))
+
+    def _fetch_duals(self, keys):
+        """ Fetch the duals of keys from the worker and request them after every following solve """
+        duals = self._pool.call(self._key, _get_duals, keys)
+        self._dual_keys.extend(keys)
+        return dict(zip(keys, duals))
+
+
+class RemoteConstraint(object):
+    """
+    Key of a constraint (or constraint index) of a RemoteProblem.
+    """
+    def __init__(self, name, index=None, length=1):
+        self.name = name
+        self.index = index
+        self.length = length
+
+    def __getitem__(self, index):
+        return RemoteConstraint(self.name, index)
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        return isinstance(other, RemoteConstraint) and (self.name, self.index) == (other.name, other.index)
+
+    def __hash__(self):
+        return hash((self.name, self.index))
+
+
+class RemoteSet(list):
+    """
+    List of the elements of a Pyomo set of a RemoteProblem, positional access starts at 1 like in Pyomo.
+    """
+    def __getitem__(self, position):
+        if isinstance(position, int) and position > 0:
+            position -= 1
+        return list.__getitem__(self, position)
+
+
+class _RemoteDuals(dict):
+    """ Duals of a RemoteProblem; duals which were not requested before are fetched from the worker """
+    def __init__(self, problem, duals):
+        dict.__init__(self, duals)
+        self._problem = problem
+
+    def __missing__(self, key):
+        self.request([key])
+        return self[key]
+
+    def request(self, keys):
+        """ Fetch the duals of all keys which are missing in one call """
+        missing = list(OrderedDict.fromkeys(key for key in keys if key not in self))
+        if missing:
+            self.update(self._problem._fetch_duals(missing))
+
+
+class _Value(object):
+    """ Callable constant, like the value of a solved Pyomo component """
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+
+def _worker_create(key, cls, args, kwargs, solver, solver_options):
+    """ Create a sub problem and its solver in a worker process and return its name """
+    from pyomo.opt import SolverFactory
+    problem = cls(*args, **kwargs)
+    optim = SolverFactory(solver)
+    for option, value in solver_options.items():
+        optim.set_options('{}={}'.format(option, value))
+    _worker_problems[key] = (problem, optim)
+    return problem.name
+
+
+def _worker_solve(key, boundaries, dual_keys):
+    """ Set the boundaries of a sub problem, solve it and return the values needed by its RemoteProblem """
+    problem, optim = _worker_problems[key]
+    for bound_name, values in boundaries:
+        problem.set_boundary_values(bound_name, values)
+    problem.solve(optim)
+    return {'Lambda': problem.Lambda(),
+            'costs': OrderedDict((ct, problem.costs[ct]()) for ct in problem.cost_type),
+            'duals': _get_duals(problem, dual_keys)}
+
+
+def _worker_call(key, function, args):
+    """ Call function with a sub problem of this worker """
+    return function(_worker_problems[key][0], *args)
+
+
+def _add_cut_constraint(problem, terms, coefficients, rhs):
+    """ Add a cut given by (component name, index) terms to problem """
+    import numpy as np
+    variables = [getattr(problem, name) if index is None else getattr(problem, name)[index]
+                 for name, index in terms]
+    problem.add_cut_constraint(np.array(coefficients, dtype=float), variables, rhs)
+
+
+def _get_duals(problem, keys):
+    """ Return the duals of the constraints of problem given by RemoteConstraint keys """
+    duals = []
+    for key in keys:
+        constraint = getattr(problem, key.name)
+        if key.index is not None:
+            constraint = constraint[key.index]
+        duals.append(problem.dual[constraint])
+    return duals
+
+
+def _describe_component(problem, name):
+    """ Return a picklable description of a component of problem for a RemoteProblem """
+    import pyomo.core as pyomo
+    component = getattr(problem, name)
+    if isinstance(component, pyomo.Set):
+        return RemoteSet(component)
+    if isinstance(component, pyomo.Constraint):
+        return RemoteConstraint(name, length=len(component))
+    if isinstance(component, (pyomo.Var, pyomo.Param, pyomo.Expression)):
+        raise AttributeError("The values of '{}' are not available in a RemoteProblem".format(name))
+    return component
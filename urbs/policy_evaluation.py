@@ -0,0 +1,193 @@
+import math
+import multiprocessing
+
+import numpy as np
+
+# trained problems of the running evaluate_policy, inherited by its forked worker processes
+_evaluation = None
+
+
+class PolicyEvaluation(object):
+    """Out-of-sample estimate of the costs of an SDDP policy.
+
+    Holds the costs of the simulated realization paths (see evaluate_policy)
+    and the confidence interval of their mean. The lower bound of the
+    master problem is no larger than the expected policy costs, so the
+    training has converged, up to sampling error, as soon as the lower
+    bound lies within the interval (see converged). Unlike the spread of the
+    upper bounds of the last forward passes, the interval is computed from
+    independent paths and the same policy.
+
+    The estimate is only valid if it has at least two paths, since the
+    interval of a single path is unbounded, if no stage problem was relaxed
+    on any path, since the path costs do not contain the relaxation, and if
+    the lower bound does not exceed the interval, which indicates too few
+    paths or invalid cuts (see status).
+    """
+    def __init__(self, costs, confidence=0.95, infeasible=0):
+        """Computes the confidence interval of the mean of the path costs.
+
+        Args:
+            costs: costs of the simulated paths
+            confidence: confidence level of the interval, default: 0.95
+            infeasible: number of paths on which a stage problem was relaxed (Lambda > 0)
+        """
+        self.costs = np.asarray(costs, dtype=float)
+        self.confidence = confidence
+        self.infeasible = infeasible
+        self.mean = self.costs.mean()
+        self.stddev = self.costs.std(ddof=1) if len(self.costs) > 1 else float('inf')
+        self.half_width = _normal_quantile(0.5 + confidence / 2) * self.stddev / math.sqrt(len(self.costs))
+        self.lower = self.mean - self.half_width
+        self.upper = self.mean + self.half_width
+
+    def status(self, lower_bound):
+        """Compares lower_bound with the confidence interval.
+
+        Args:
+            lower_bound: lower bound of the SDDP training, i.e. the master objective
+
+        Returns:
+            'converged' if lower_bound is within the interval, 'not converged' if it
+            is below, 'too few paths' if there are less than two paths, 'relaxed paths'
+            if a stage problem was relaxed on some path and 'lower bound above interval'
+            if it is above; the last three mean the estimate is invalid
+        """
+        if len(self.costs) < 2:
+            return 'too few paths'
+        if self.infeasible > 0:
+            return 'relaxed paths'
+        if lower_bound > self.upper:
+            return 'lower bound above interval'
+        if lower_bound >= self.lower:
+            return 'converged'
+        return 'not converged'
+
+    def converged(self, lower_bound):
+        """Returns True if the estimate is valid and lower_bound is within the confidence interval.
+
+        Args:
+            lower_bound: lower bound of the SDDP training, i.e. the master objective
+        """
+        return self.status(lower_bound) == 'converged'
+
+    def __str__(self):
+        return ('policy costs {:.5e} +- {:.3e} ({:.0%} confidence, {} paths, {} infeasible)'
+                .format(self.mean, self.half_width, self.confidence, len(self.costs), self.infeasible))
+
+
+def evaluate_policy(master, stages, probabilities, boundaries, solver, number_of_paths=100, confidence=0.95,
+                    seed=None, number_of_workers=1, solver_options=None):
+    """Simulates sampled realization paths through the trained SDDP stage problems.
+
+    The cuts are not changed. Starting from the current solution of the master
+    problem, each path draws one realization per stage, sets its boundaries from
+    the problem of the previous stage of the path and solves it. The cost of a
+    path is the sum of the costs of the master and its stage problems without
+    their future costs. The paths are drawn up front, so that the result only
+    depends on seed, not on the number of workers.
+
+    With several workers, the paths are split among forked worker processes,
+    which inherit the trained problems; only the path costs are sent back. The
+    problems of the calling process are not changed then. Without fork (e.g. on
+    Windows), or with one worker, the paths are simulated in this process and
+    the stage problems keep the solution of the last path.
+
+    Args:
+        master: the solved SddpMaster
+        stages: list of the stages after the master, each a dict of realization names to SddpSub instances
+        probabilities: dict of realization names to probabilities, e.g. ScenarioTree.probabilities
+        boundaries: list of (name, bound_name) pairs passed from one stage to the next, see
+            ModelSuper.set_boundaries
+        solver: name of the solver, e.g. 'gurobi'
+        number_of_paths: number of simulated paths, at least 2
+        confidence: confidence level of the interval, default: 0.95
+        seed: optional seed of the path sampling
+        number_of_workers: number of worker processes, default: 1
+        solver_options: optional dict of solver options
+
+    Returns:
+        a PolicyEvaluation
+
+    Example:
+        >>> evaluation = evaluate_policy(master, stages, tree.probabilities, boundaries, 'gurobi',
+        ...                              number_of_paths=200, number_of_workers=8)
+        >>> print(evaluation, evaluation.status(master.obj()))
+        >>> if evaluation.converged(master.obj()):
+        >>>     break
+    """
+    global _evaluation
+    if number_of_paths < 2:
+        raise ValueError('The confidence interval needs at least 2 paths.')
+    realizations = list(probabilities)
+    weights = np.array([probabilities[r] for r in realizations], dtype=float)
+    random_state = np.random.RandomState(seed)
+    paths = [[realizations[k] for k in random_state.choice(len(realizations), len(stages), p=weights / weights.sum())]
+             for _ in range(number_of_paths)]
+
+    _evaluation = (master, stages, boundaries, solver, solver_options)
+    try:
+        number_of_workers = max(1, min(number_of_workers, number_of_paths))
+        if number_of_workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            batches = [paths[k::number_of_workers] for k in range(number_of_workers)]
+            pool = multiprocessing.get_context('fork').Pool(number_of_workers)
+            try:
+                results = pool.map(_simulate_paths, batches)
+            finally:
+                pool.close()
+                pool.join()
+            # restore the order of the paths
+            results = [results[k % number_of_workers][k // number_of_workers] for k in range(number_of_paths)]
+        else:
+            results = _simulate_paths(paths)
+    finally:
+        _evaluation = None
+
+    costs = [cost for cost, relaxed in results]
+    infeasible = sum(1 for cost, relaxed in results if relaxed)
+    return PolicyEvaluation(costs, confidence, infeasible)
+
+
+def _simulate_paths(paths):
+    """ Return (cost, relaxed) of each path through the problems of _evaluation """
+    from pyomo.opt import SolverFactory
+    master, stages, boundaries, solver, solver_options = _evaluation
+    # one solver per problem, as needed by persistent solvers
+    optims = {}
+    first_stage_costs = _stage_costs(master)
+    results = []
+    for path in paths:
+        cost = first_stage_costs
+        relaxed = False
+        previous = master
+        for stage, realization in zip(stages, path):
+            problem = stage[realization]
+            for name, bound_name in boundaries:
+                problem.set_boundaries(previous, name, bound_name)
+            if id(problem) not in optims:
+                optims[id(problem)] = SolverFactory(solver)
+                for key, value in (solver_options or {}).items():
+                    optims[id(problem)].options[key] = value
+            problem.solve(optims[id(problem)])
+            cost += _stage_costs(problem)
+            relaxed = relaxed or problem.Lambda() > 0.000001
+            previous = problem
+        results.append((cost, relaxed))
+    return results
+
+
+def _stage_costs(problem):
+    """ Return the costs of the solved problem without its future costs """
+    return sum(problem.costs[ct]() for ct in problem.cost_type if ct != 'FutureCosts')
+
+
+def _normal_quantile(p):
+    """ Return the p-quantile of the standard normal distribution """
+    low, high = -10.0, 10.0
+    while high - low > 1e-10:
+        middle = (low + high) / 2
+        if 0.5 * (1 + math.erf(middle / math.sqrt(2))) < p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
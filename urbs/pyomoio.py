@@ -1,10 +1,26 @@
+import weakref
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 import pyomo.core as pyomo
+from .tracing import traced
+
+# domain indices per model instance, see _get_cached_domain_index
+_domain_index_cache = weakref.WeakKeyDictionary()
 
 
+@traced('get_entity')
 def get_entity(instance, name):
     """ Retrieve values (or duals) for an entity in a model instance.
 
+    Values of Params, Vars, Expressions and Constraints are read in bulk into
+    a preallocated NumPy array. For entities defined on all elements of their
+    domain, the index is assembled from the factorized onset sets and cached
+    per instance, so entities on the same onset sets reuse it; otherwise it
+    is built once with MultiIndex.from_arrays. No tuple per element is
+    created in either case.
+
     Args:
         instance: a Pyomo ConcreteModel instance
         name: name of a Set, Param, Var, Constraint or Objective
@@ -13,88 +29,39 @@ def get_entity(instance, name):
         a Pandas Series with domain as index and values (or 1's, for sets) of
         entity name. For constraints, it retrieves the dual values
     """
-    # magic: short-circuit if problem contains a result cache
-    # if hasattr(instance, '_result') and name in instance._result:
-    #     return instance._result[name].copy(deep=True)
+    # magic: short-circuit if problem contains a result cache, e.g. a solved
+    # NormalMatrix or a loaded ResultContainer
+    if (not isinstance(instance, pyomo.Block) and
+            name in (getattr(instance, '_result', None) or {})):
+        return instance._result[name].copy(deep=True)
 
-    # retrieve entity, its type and its onset names
     entity = instance.__getattribute__(name)
+    if not isinstance(entity, pyomo.Set):
+        index, values = _get_entity_data(instance, entity, name)
+        if index is None:
+            # return empty Series
+            return pd.Series(name=name)
+        # copy the (possibly cached) index, as callers rename its levels
+        return pd.Series(values, index=index.copy(), name=name)
+
     labels = _get_onset_names(entity)
 
     # extract values
-    if isinstance(entity, pyomo.Set):
-        if entity.dimen > 1:
-            results = pd.DataFrame([v + (1,) for v in entity.value])
-        else:
-            # Pyomo sets don't have values, only elements
-            results = pd.DataFrame([(v, 1) for v in entity.value])
-
-        # for unconstrained sets, the column label is identical to their index
-        # hence, make index equal to entity name and append underscore to name
-        # (=the later column title) to preserve identical index names for both
-        # unconstrained supersets
-        if not labels:
-            labels = [name]
-            name = name+'_'
-
-    elif isinstance(entity, pyomo.Param):
-        if entity.dim() > 1:
-            results = pd.DataFrame(
-                [v[0]+(v[1],) for v in entity.iteritems()])
-        elif entity.dim() == 1:
-            results = pd.DataFrame(
-                [(v[0], v[1]) for v in entity.iteritems()])
-        else:
-            results = pd.DataFrame(
-                [(v[0], v[1].value) for v in entity.iteritems()])
-            labels = ['None']
-
-    elif isinstance(entity, pyomo.Expression):
-        if entity.dim() > 1:
-            results = pd.DataFrame(
-                [v[0] + (v[1](),) for v in entity.iteritems()])
-        elif entity.dim() == 1:
-            results = pd.DataFrame(
-                [(v[0], v[1]()) for v in entity.iteritems()])
-        else:
-            results = pd.DataFrame(
-                [(v[0], v[1]()) for v in entity.iteritems()])
-            labels = ['None']
-
-    elif isinstance(entity, pyomo.Constraint):
-        if entity.dim() > 1:
-            results = pd.DataFrame(
-                [v[0] + (instance.dual[v[1]],) for v in entity.iteritems()])
-        elif entity.dim() == 1:
-            results = pd.DataFrame(
-                [(v[0], instance.dual[v[1]]) for v in entity.iteritems()])
-        else:
-            results = pd.DataFrame(
-                [(v[0], instance.dual[v[1]]) for v in entity.iteritems()])
-            labels = ['None']
-
+    if entity.dimen > 1:
+        results = pd.DataFrame([v + (1,) for v in entity.value])
     else:
-        # create DataFrame
-        if entity.dim() > 1:
-            # concatenate index tuples with value if entity has
-            # multidimensional indices v[0]
-            results = pd.DataFrame(
-                [v[0]+(v[1].value,) for v in entity.iteritems()])
-        elif entity.dim() == 1:
-            # otherwise, create tuple from scalar index v[0]
-            results = pd.DataFrame(
-                [(v[0], v[1].value) for v in entity.iteritems()])
-        else:
-            # assert(entity.dim() == 0)
-            results = pd.DataFrame(
-                [(v[0], v[1].value) for v in entity.iteritems()])
-            labels = ['None']
+        # Pyomo sets don't have values, only elements
+        results = pd.DataFrame([(v, 1) for v in entity.value])
 
-    # check for duplicate onset names and append one to several "_" to make
-    # them unique, e.g. ['sit', 'sit', 'com'] becomes ['sit', 'sit_', 'com']
-    for k, label in enumerate(labels):
-        if label in labels[:k] or label == name:
-            labels[k] = labels[k] + "_"
+    # for unconstrained sets, the column label is identical to their index
+    # hence, make index equal to entity name and append underscore to name
+    # (=the later column title) to preserve identical index names for both
+    # unconstrained supersets
+    if not labels:
+        labels = [name]
+        name = name+'_'
+
+    labels = _unique_labels(labels, name)
 
     if not results.empty:
         # name columns according to labels + entity name
@@ -109,11 +76,219 @@ def get_entity(instance, name):
     return results
 
 
+def _get_entity_data(instance, entity, name):
+    """ Retrieve index and values of a Param, Var, Expression or Constraint.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        entity: a Param, Var, Expression, Constraint or Objective of instance
+        name: name of entity
+
+    Returns:
+        tuple (index, values); the index may be shared with other entities
+        on the same onset sets and must not be modified. (None, None) if
+        entity has no elements
+    """
+    if entity.dim() == 0:
+        labels = ['None']
+    else:
+        labels = _get_onset_names(entity)
+    labels = _unique_labels(labels, name)
+
+    domain = _get_domain(entity)
+    if domain is not None:
+        index = _get_cached_domain_index(instance, domain, labels)
+    else:
+        index = _get_index(list(entity.keys()), labels)
+    if len(index) == 0:
+        return None, None
+    return index, _get_values(instance, entity, len(index))
+
+
+def _unique_labels(labels, name):
+    """ Make onset names unique and distinct from the entity name.
+
+    Appends one to several "_" to duplicate onset names, e.g.
+    ['sit', 'sit', 'com'] becomes ['sit', 'sit_', 'com'].
+
+    Args:
+        labels: list of onset names as returned by _get_onset_names
+        name: name of the entity (= the later column title)
+
+    Returns:
+        list of unique onset names
+    """
+    labels = list(labels)
+    for k, label in enumerate(labels):
+        if label in labels[:k] or label == name:
+            labels[k] = labels[k] + "_"
+    return labels
+
+
+def _iter_values(instance, entity):
+    """ Return an iterator over the values (or duals) of an entity.
+
+    The values are yielded in the order of entity.keys().
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        entity: a Param, Var, Expression, Constraint or Objective of instance
+
+    Returns:
+        iterator over values, duals for constraints
+    """
+    if isinstance(entity, pyomo.Constraint):
+        return (instance.dual[v] for v in entity.values())
+    elif isinstance(entity, pyomo.Var):
+        return (v.value for v in entity.values())
+    elif isinstance(entity, pyomo.Expression):
+        return (v() for v in entity.values())
+    else:
+        return (pyomo.value(v) for v in entity.values())
+
+
+def _get_values(instance, entity, count):
+    """ Read all values (or duals) of an entity into a NumPy array.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        entity: a Param, Var, Expression, Constraint or Objective of instance
+        count: number of elements of entity
+
+    Returns:
+        float array of values with NaN for missing values; object array if
+        the entity holds non-numeric values
+    """
+    try:
+        return np.fromiter((np.nan if v is None else v
+                            for v in _iter_values(instance, entity)),
+                           dtype=float, count=count)
+    except (TypeError, ValueError):
+        # non-numeric values, e.g. string parameters
+        values = np.empty(count, dtype=object)
+        for k, v in enumerate(_iter_values(instance, entity)):
+            values[k] = v
+        return values
+
+
+def _get_domain(entity):
+    """ Return the onset sets of an entity defined on its whole domain.
+
+    Args:
+        entity: a Param, Var, Expression, Constraint or Objective
+
+    Returns:
+        list of the sets whose cartesian product is the index of entity, or
+        None if entity is scalar or not defined for every element of it
+    """
+    if entity.dim() == 0 or not entity._index:
+        return None
+    domain = list(getattr(entity._index, 'set_tuple', [entity._index]))
+    size = 1
+    for domain_set in domain:
+        size *= len(domain_set)
+    if len(entity) != size:
+        # sparse entity, e.g. a constraint with skipped elements
+        return None
+    return domain
+
+
+def _get_cached_domain_index(instance, domain, labels):
+    """ Return the domain index of onset sets, built once per instance.
+
+    The cache is keyed by the names and sizes of the onset sets and the
+    index labels, so that all entities on the same onset sets share one
+    index object. Instances are referenced weakly and thus not kept alive
+    (or pickled along) by the cache.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        domain: list of onset sets, as returned by _get_domain
+        labels: list of unique onset names
+
+    Returns:
+        the index as returned by _get_domain_index
+    """
+    key = (tuple((domain_set.name, len(domain_set)) for domain_set in domain),
+           tuple(labels))
+    try:
+        cache = _domain_index_cache.setdefault(instance, {})
+    except TypeError:
+        # instance does not support weak references
+        return _get_domain_index(domain, labels)
+    if key not in cache:
+        cache[key] = _get_domain_index(domain, labels)
+    return cache[key]
+
+
+def _get_domain_index(domain, labels):
+    """ Build the index of the cartesian product of onset sets.
+
+    Every onset set is factorized once; the codes of the product are then
+    derived by repeating and tiling the positions within each set, in the
+    iteration order of the product.
+
+    Args:
+        domain: list of onset sets, as returned by _get_domain
+        labels: list of unique onset names
+
+    Returns:
+        a MultiIndex for multi-dimensional domains, an Index otherwise
+    """
+    if len(labels) == 1:
+        return pd.Index(list(domain[0]), name=labels[0])
+
+    sizes = [len(domain_set) for domain_set in domain]
+    total = int(np.prod(sizes))
+    levels = []
+    codes = []
+    repeat = total
+    for domain_set, size in zip(domain, sizes):
+        if size == 0:
+            return pd.MultiIndex.from_arrays([[]] * len(labels), names=labels)
+        repeat //= size
+        positions = np.tile(np.repeat(np.arange(size), repeat),
+                            total // (repeat * size))
+        elements = list(domain_set)
+        if domain_set.dimen > 1:
+            columns = [list(column) for column in zip(*elements)]
+        else:
+            columns = [elements]
+        for column in columns:
+            column = pd.Categorical(column)
+            levels.append(column.categories)
+            codes.append(column.codes[positions])
+    return pd.MultiIndex(levels=levels, codes=codes, names=labels,
+                         verify_integrity=False)
+
+
+def _get_index(keys, labels):
+    """ Build the index for a list of entity keys in one go.
+
+    Args:
+        keys: list of index tuples (or scalars) of an entity
+        labels: list of unique onset names
+
+    Returns:
+        a MultiIndex built level by level for multi-dimensional keys, an
+        Index otherwise
+    """
+    if not keys:
+        return pd.Index([])
+    elif len(labels) > 1:
+        return pd.MultiIndex.from_arrays(
+            [list(level) for level in zip(*keys)], names=labels)
+    else:
+        return pd.Index(keys, name=labels[0])
+
+
 def get_entities(instance, names):
     """ Return one DataFrame with entities in columns and a common index.
 
     Works only on entities that share a common domain (set or set_tuple), which
-    is used as index of the returned DataFrame.
+    is used as index of the returned DataFrame. Consecutive entities on the
+    same onset sets are placed side by side on their shared index; only
+    entities on differing domains are joined.
 
     Args:
         instance: a Pyomo ConcreteModel instance
@@ -124,11 +299,9 @@ def get_entities(instance, names):
     """
 
     df = pd.DataFrame()
-    for name in names:
-        other = get_entity(instance, name)
-
+    for other in _get_entity_blocks(instance, names):
         if df.empty:
-            df = other.to_frame()
+            df = other
         else:
             index_names_before = df.index.names
 
@@ -140,6 +313,40 @@ def get_entities(instance, names):
     return df
 
 
+def _get_entity_blocks(instance, names):
+    """ Yield DataFrames of consecutive entities sharing one index object.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        names: list of entity names
+
+    Returns:
+        generator of DataFrames with entities as columns
+    """
+    index = None
+    columns = OrderedDict()
+    cached = not isinstance(instance, pyomo.Block)
+    for name in names:
+        entity = None if cached else instance.__getattribute__(name)
+        if cached or isinstance(entity, pyomo.Set):
+            series = get_entity(instance, name)
+            other_index, values, name = series.index, series.values, series.name
+        else:
+            other_index, values = _get_entity_data(instance, entity, name)
+            if other_index is None:
+                other_index, values = pd.Index([]), []
+
+        if columns and other_index is not index:
+            yield pd.DataFrame(columns, index=index.copy(),
+                               columns=list(columns))
+            columns = OrderedDict()
+        index = other_index
+        columns[name] = values
+
+    if columns:
+        yield pd.DataFrame(columns, index=index.copy(), columns=list(columns))
+
+
 def list_entities(instance, entity_type):
     """ Return list of sets, params, variables, constraints or objectives
 
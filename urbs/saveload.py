@@ -1,8 +1,29 @@
+import functools
+import json
+import os
+import re
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
 import pandas as pd
+import pyomo.core as pyomo
 from .pyomoio import get_entity, list_entities
+from .tracing import traced
 
 
 def create_result_cache(prob):
+    result_cache = {}
+    for entity, value in _iter_result_cache(prob):
+        result_cache[entity] = value
+    return result_cache
+
+
+def _list_result_entities(prob):
+    if not isinstance(prob, pyomo.Block) and prob._result is not None:
+        # result cache of a model built without Pyomo, e.g. NormalMatrix
+        return list(prob._result)
+
     entity_types = ['set', 'par', 'var', 'expr']
     #if hasattr(prob, 'dual'):
      #   entity_types.append('con')
@@ -10,37 +31,585 @@ def create_result_cache(prob):
     entities = []
     for entity_type in entity_types:
         entities.extend(list_entities(prob, entity_type).index.tolist())
+    return entities
 
-    result_cache = {}
-    for entity in entities:
-        result_cache[entity] = get_entity(prob, entity)
-    return result_cache
 
+def _iter_result_cache(prob, workers=None):
+    """ Yield (name, Series) pairs of all result cache entities.
+
+    Args:
+        prob: a urbs model instance
+        workers: number of threads extracting the entities; if None, they
+                 are extracted one after another
 
-def save(prob, filename):
+    Returns:
+        generator of (entity name, Series) pairs; with workers, in the order
+        the extractions finish
+    """
+    entities = _list_result_entities(prob)
+    if not workers:
+        for entity in entities:
+            yield entity, get_entity(prob, entity)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(get_entity, prob, entity): entity
+                   for entity in entities}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+@traced('save')
+def save(prob, filename, compression=None, complevel=5, workers=None,
+         backend='hdf5'):
     """Save urbs model input and result cache to a HDF5 store file.
 
+    By default, all frames are written uncompressed in fixed format. With a
+    compression library, e.g. 'blosc:zstd', frames are written in table
+    format with their index levels as categorical-coded data columns, so
+    that no object-dtype index needs to be pickled. Frames the table format
+    cannot hold (e.g. mixed-type columns) are still written in fixed format.
+
+    With backend 'parquet' or 'feather', filename is a directory instead, in
+    which every frame is written to its own file next to a manifest (see
+    _save_columnar).
+
     Args:
         prob: a urbs model instance containing a solution
-        filename: HDF5 store file to be written
+        filename: HDF5 store file (or directory) to be written
+        compression: optional compression library as accepted by
+                     pd.HDFStore, e.g. 'blosc:zstd' or 'zlib'; for the
+                     columnar backends e.g. 'zstd', 'snappy' or 'lz4'
+        complevel: compression level (0-9), only used with compression
+        workers: optional number of threads extracting the result entities
+                 while the store is written
+        backend: 'hdf5' (default), 'parquet' or 'feather'
 
     Returns:
         Nothing
     """
+    if backend in _COLUMNAR_FORMATS:
+        prob._result = _save_columnar(prob, filename, backend, compression,
+                                      workers)
+        return
+    elif backend != 'hdf5':
+        raise ValueError("Unknown backend '{}'".format(backend))
+
     import warnings
     import tables
-    warnings.filterwarnings('ignore',
-                            category=pd.io.pytables.PerformanceWarning)
     warnings.filterwarnings('ignore',
                             category=tables.NaturalNameWarning)
 
-    #if not hasattr(prob, '_result'):
-    prob._result = create_result_cache(prob)
-    with pd.HDFStore(filename, mode='w') as store:
+    if compression is None:
+        store = pd.HDFStore(filename, mode='w')
+    else:
+        store = pd.HDFStore(filename, mode='w', complevel=complevel,
+                            complib=compression)
+
+    result_cache = {}
+    with store, warnings.catch_warnings():
+        if compression is None:
+            # object indexes are pickled by design in the default fixed
+            # format; with compression, the remaining fixed-format fallbacks
+            # are reported
+            warnings.simplefilter('ignore',
+                                  category=pd.io.pytables.PerformanceWarning)
         for name in prob._data.keys():
-            store['data/'+name] = prob._data[name]
-        for name in prob._result.keys():
-            store['result/'+name] = prob._result[name]
+            _put(store, 'data/'+name, prob._data[name], compression)
+        for name, value in _iter_result_cache(prob, workers):
+            result_cache[name] = value
+            _put(store, 'result/'+name, value, compression)
+    prob._result = result_cache
+
+
+def _put(store, key, value, compression):
+    """ Write a frame to the store, in table format if compressed.
+
+    Args:
+        store: an open pd.HDFStore
+        key: node name
+        value: DataFrame or Series
+        compression: compression library or None for fixed format
+
+    Returns:
+        Nothing
+    """
+    if compression is None or len(value) == 0:
+        # table format does not store empty frames
+        store.put(key, value, format='fixed')
+        return
+    try:
+        table, categories = _to_table(value)
+        store.put(key, table, format='table',
+                  data_columns=list(table.columns[:len(categories)]),
+                  index=False)
+    except (TypeError, ValueError):
+        # mixed-type object columns, non-string column labels, missing
+        # index labels or index names clashing with columns are not
+        # supported in table format
+        store.put(key, value, format='fixed')
+        return
+    attrs = store.get_storer(key).attrs
+    attrs.urbs_index = list(value.index.names)
+    attrs.urbs_categories = categories
+    attrs.urbs_series = isinstance(value, pd.Series)
+
+
+def _to_table(value):
+    """ Flatten a frame for the table format.
+
+    Object-dtype index levels are replaced by their integer codes, their
+    categories are returned separately to be stored as node attributes.
+
+    Args:
+        value: DataFrame or Series with named columns
+
+    Returns:
+        tuple (DataFrame with index levels as leading columns, list of
+        categories per index level or None for levels stored as is)
+    """
+    if isinstance(value, pd.Series):
+        value = value.to_frame()
+    nlevels = value.index.nlevels
+    table = value.reset_index()
+    categories = []
+    for column in table.columns[:nlevels]:
+        if table[column].isnull().any():
+            raise ValueError("Missing index labels in '{}'".format(column))
+        if table[column].dtype == object:
+            codes = pd.Categorical(table[column])
+            table[column] = codes.codes
+            categories.append(list(codes.categories))
+        else:
+            categories.append(None)
+    return table, categories
+
+
+def _get(store, key, where=None):
+    """ Read a frame written by _put from the store.
+
+    For table format nodes, the level filters are passed to the store as
+    where condition on the index columns, so only matching rows are read.
+    Fixed format nodes are filtered after reading.
+
+    Args:
+        store: an open pd.HDFStore
+        key: node name
+        where: optional dict of level filters, see load
+
+    Returns:
+        the DataFrame or Series as passed to _put, restricted to where
+    """
+    attrs = store.get_storer(key).attrs
+    index_names = getattr(attrs, 'urbs_index', None)
+    if index_names is None:
+        return _filter_frame(store[key], where)
+
+    terms = _where_terms(where, index_names, attrs.urbs_categories)
+    value = store.select(key, where=terms or None)
+    return _from_table(value, index_names, attrs.urbs_categories,
+                       attrs.urbs_series)
+
+
+def _where_terms(where, index_names, categories):
+    """ Translate level filters to HDFStore where terms of a table node.
+
+    Args:
+        where: dict of level filters, see load
+        index_names: index level names of the node
+        categories: categories per index level, as returned by _to_table
+
+    Returns:
+        list of where term strings; levels not in index_names are ignored
+    """
+    terms = []
+    for level, condition in (where or {}).items():
+        if level not in index_names:
+            continue
+        level_categories = categories[index_names.index(level)]
+        if level_categories is not None:
+            # coded level: select matching codes
+            codes = [code for code, label in enumerate(level_categories)
+                     if _matches(label, condition)]
+            if codes:
+                terms.append('{} in {!r}'.format(level, codes))
+            else:
+                terms.append('index < 0')
+        elif isinstance(condition, slice):
+            if condition.start is not None:
+                terms.append('{} >= {!r}'.format(
+                    level, _to_builtin(condition.start)))
+            if condition.stop is not None:
+                terms.append('{} <= {!r}'.format(
+                    level, _to_builtin(condition.stop)))
+        elif _is_collection(condition):
+            terms.append('{} in {!r}'.format(
+                level, [_to_builtin(value) for value in condition]))
+        else:
+            terms.append('{} == {!r}'.format(level, _to_builtin(condition)))
+    return terms
+
+
+def _where_filters(where, index_names):
+    """ Translate level filters to pyarrow filters of a columnar frame.
+
+    Args:
+        where: dict of level filters, see load
+        index_names: index level names of the frame
+
+    Returns:
+        list of (level, op, value) filters or None; levels not in
+        index_names are ignored
+    """
+    filters = []
+    for level, condition in (where or {}).items():
+        if level not in index_names:
+            continue
+        if isinstance(condition, slice):
+            if condition.start is not None:
+                filters.append((level, '>=', condition.start))
+            if condition.stop is not None:
+                filters.append((level, '<=', condition.stop))
+        elif _is_collection(condition):
+            filters.append((level, 'in', list(condition)))
+        else:
+            filters.append((level, '==', condition))
+    return filters or None
+
+
+def _filter_frame(value, where):
+    """ Apply level filters to a frame in memory.
+
+    Args:
+        value: DataFrame or Series
+        where: dict of level filters, see load
+
+    Returns:
+        the rows of value matching all filters on its index levels
+    """
+    mask = None
+    for level, condition in (where or {}).items():
+        if level not in value.index.names:
+            continue
+        labels = value.index.get_level_values(level)
+        if isinstance(condition, slice):
+            matches = np.ones(len(labels), dtype=bool)
+            if condition.start is not None:
+                matches &= labels >= condition.start
+            if condition.stop is not None:
+                matches &= labels <= condition.stop
+        elif _is_collection(condition):
+            matches = labels.isin(list(condition))
+        else:
+            matches = labels == condition
+        mask = matches if mask is None else mask & matches
+    if mask is None:
+        return value
+    return value[mask]
+
+
+def _matches(label, condition):
+    """ Check whether a single index label matches a level filter """
+    if isinstance(condition, slice):
+        return ((condition.start is None or label >= condition.start) and
+                (condition.stop is None or label <= condition.stop))
+    elif _is_collection(condition):
+        return label in condition
+    else:
+        return label == condition
+
+
+def _is_collection(condition):
+    """ Check whether a level filter is a collection of allowed labels """
+    return isinstance(condition, (list, tuple, set, frozenset, range,
+                                  pd.Index, np.ndarray))
+
+
+def _from_table(table, index_names, categories, series):
+    """ Restore a frame flattened by _to_table.
+
+    Args:
+        table: DataFrame with index levels as leading columns
+        index_names: original index level names
+        categories: list of categories per index level, as returned by
+                    _to_table
+        series: whether the original frame was a Series
+
+    Returns:
+        DataFrame or Series with the index levels restored
+    """
+    nlevels = len(index_names)
+    columns = []
+    for column, level in zip(table.columns[:nlevels], categories):
+        column = table[column]
+        if level is not None:
+            column = pd.Categorical.from_codes(column.values, level)
+        columns.append(column)
+    index = _restore_index(columns, index_names)
+
+    value = table[table.columns[nlevels:]]
+    value.index = index
+    if series:
+        value = value[value.columns[0]]
+    return value
+
+
+def _restore_index(columns, names):
+    """ Build an index from index level columns.
+
+    Categorical columns are turned into plain levels via their categories
+    and codes, without factorizing the values again.
+
+    Args:
+        columns: list of Series or Categoricals, one per index level
+        names: index level names
+
+    Returns:
+        an Index for one column, a MultiIndex otherwise
+    """
+    columns = [column.values
+               if isinstance(column, pd.Series) and hasattr(column, 'cat')
+               else column for column in columns]
+    if len(columns) == 1 and not isinstance(columns[0], pd.Categorical):
+        return pd.Index(np.asarray(columns[0]), name=names[0])
+
+    levels = []
+    codes = []
+    for column in columns:
+        if isinstance(column, pd.Categorical):
+            levels.append(pd.Index(column.categories))
+            codes.append(column.codes)
+        else:
+            level_codes, level = pd.factorize(column, sort=True)
+            levels.append(level)
+            codes.append(level_codes)
+    if len(columns) == 1:
+        return pd.Index(levels[0].take(codes[0]), name=names[0])
+    return pd.MultiIndex(levels=levels, codes=codes, names=names,
+                         verify_integrity=False)
+
+
+# columnar backends: one Parquet or Feather file per frame
+_COLUMNAR_FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+_MANIFEST = 'manifest.json'
+_ROW_GROUP_SIZE = 65536
+
+
+def _save_columnar(prob, directory, file_format, compression=None,
+                   workers=None):
+    """ Save urbs model input and result cache as Parquet or Feather files.
+
+    Every frame is written to <directory>/<group>/<name>.<file_format>, with
+    its index levels as leading columns. Object-dtype index levels are
+    dictionary-encoded. The manifest <directory>/manifest.json lists all
+    frames with the information needed to restore them. Frames that cannot
+    be converted to Arrow (e.g. mixed-type columns) are pickled instead.
+
+    Args:
+        prob: a urbs model instance containing a solution
+        directory: directory to be written, created if necessary
+        file_format: 'parquet' or 'feather'
+        compression: optional compression codec, e.g. 'zstd'; Feather files
+                     are only memory-mapped without copy if uncompressed
+        workers: optional number of threads extracting the result entities
+
+    Returns:
+        the result cache
+    """
+
+    manifest = {'format': file_format, 'data': {}, 'result': {}}
+    for group in ['data', 'result']:
+        os.makedirs(os.path.join(directory, group), exist_ok=True)
+
+    for name in prob._data.keys():
+        manifest['data'][name] = _write_columnar(
+            directory, 'data', name, prob._data[name], file_format,
+            compression)
+    result_cache = {}
+    for name, value in _iter_result_cache(prob, workers):
+        result_cache[name] = value
+        manifest['result'][name] = _write_columnar(
+            directory, 'result', name, value, file_format, compression)
+
+    with open(os.path.join(directory, _MANIFEST), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    return result_cache
+
+
+def _write_columnar(directory, group, name, value, file_format,
+                    compression=None):
+    """ Write one frame as Parquet or Feather file.
+
+    Args:
+        directory: result directory
+        group: 'data' or 'result'
+        name: frame name
+        value: DataFrame or Series
+        file_format: 'parquet' or 'feather'
+        compression: optional compression codec
+
+    Returns:
+        manifest entry of the frame
+    """
+    import pyarrow as pa
+
+    series = isinstance(value, pd.Series)
+    frame = value.to_frame() if series else value
+    labels = list(frame.columns)
+    value_columns = [label if isinstance(label, str)
+                     else '__column_{}__'.format(k)
+                     for k, label in enumerate(labels)]
+    index_names = list(frame.index.names)
+    index_columns = [
+        level if isinstance(level, str) and level not in value_columns and
+        index_names.count(level) == 1
+        else '__index_level_{}__'.format(k)
+        for k, level in enumerate(index_names)]
+
+    entry = {'index': index_names,
+             'index_columns': index_columns,
+             'columns': [_to_builtin(label) for label in labels],
+             'column_names': list(frame.columns.names),
+             'value_columns': value_columns,
+             'series': series}
+
+    arrays = []
+    for k in range(frame.index.nlevels):
+        level = frame.index.get_level_values(k)
+        if level.dtype == object and not level.isnull().any():
+            level = pd.Categorical(level)
+        arrays.append(level)
+    arrays.extend(frame.iloc[:, k].values for k in range(len(labels)))
+    try:
+        table = pa.Table.from_arrays(
+            [pa.array(array, from_pandas=True) for array in arrays],
+            names=index_columns + value_columns)
+    except (pa.ArrowException, TypeError, ValueError):
+        # mixed-type object columns cannot be converted to Arrow
+        entry['file'] = group + '/' + name + '.pkl'
+        value.to_pickle(os.path.join(directory, entry['file']))
+        return entry
+
+    entry['file'] = group + '/' + name + _COLUMNAR_FORMATS[file_format]
+    path = os.path.join(directory, entry['file'])
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, compression=compression or 'NONE',
+                       row_group_size=_ROW_GROUP_SIZE)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, path,
+                              compression=compression or 'uncompressed',
+                              chunksize=_ROW_GROUP_SIZE)
+    return entry
+
+
+def _to_builtin(label):
+    """ Convert a (column) label to JSON serializable builtin values """
+    if isinstance(label, tuple):
+        return [_to_builtin(part) for part in label]
+    return label.item() if hasattr(label, 'item') else label
+
+
+def _read_manifest(directory):
+    """ Read the manifest of a result directory written by save """
+    with open(os.path.join(directory, _MANIFEST)) as manifest_file:
+        return json.load(manifest_file)
+
+
+def _read_columnar(directory, entry, file_format, columns=None,
+                   filters=None):
+    """ Read one frame written by _write_columnar.
+
+    Files are memory-mapped, so that processes reading the same result
+    directory share its pages. Only the requested columns are read, and
+    row groups (Parquet) or record batches (Feather) are pruned by the
+    filters where their statistics allow; the remaining rows are filtered
+    after reading.
+
+    Args:
+        directory: result directory
+        entry: manifest entry of the frame
+        file_format: 'parquet' or 'feather'
+        columns: optional list of value column labels to read
+        filters: optional filters on index level names in the disjunctive
+                 normal form of pyarrow, e.g. [('com', '==', 'Elec')]
+
+    Returns:
+        the DataFrame or Series as passed to _write_columnar
+    """
+    path = os.path.join(directory, entry['file'])
+    if path.endswith('.pkl'):
+        return pd.read_pickle(path)
+
+    import pyarrow.dataset as ds
+    import pyarrow.fs as fs
+    import pyarrow.parquet as pq
+
+    labels = [tuple(label) if isinstance(label, list) else label
+              for label in entry['columns']]
+    value_columns = entry['value_columns']
+    if columns is not None:
+        selected = [labels.index(label) for label in columns]
+        labels = [labels[k] for k in selected]
+        value_columns = [value_columns[k] for k in selected]
+
+    expression = None
+    if filters:
+        renames = dict(zip(entry['index'], entry['index_columns']))
+        if isinstance(filters[0], tuple):
+            filters = [filters]
+        filters = [[(renames.get(level, level), op, val)
+                    for level, op, val in conjunction]
+                   for conjunction in filters]
+        to_expression = getattr(pq, 'filters_to_expression', None)
+        if to_expression is None:
+            to_expression = pq._filters_to_expression
+        expression = to_expression(filters)
+
+    dataset = ds.dataset(
+        os.path.abspath(path),
+        format='parquet' if file_format == 'parquet' else 'ipc',
+        filesystem=fs.LocalFileSystem(use_mmap=True))
+    table = dataset.to_table(columns=entry['index_columns'] + value_columns,
+                             filter=expression)
+    frame = table.to_pandas(split_blocks=True)
+
+    index = _restore_index(
+        [frame[column] for column in entry['index_columns']], entry['index'])
+    if any(isinstance(label, tuple) for label in labels):
+        column_index = pd.MultiIndex.from_tuples(
+            labels, names=entry['column_names'])
+    else:
+        column_index = pd.Index(labels, name=entry['column_names'][0])
+
+    value = frame[value_columns]
+    value.index = index
+    value.columns = column_index
+    if entry['series']:
+        value = value[value.columns[0]]
+    return value
+
+
+def read_entity(filename, name, group='result', columns=None, filters=None):
+    """Read a single frame from a result directory written by save.
+
+    Args:
+        filename: a result directory written with backend 'parquet' or
+                  'feather'
+        name: entity (or input sheet) name
+        group: 'result' (default) or 'data'
+        columns: optional list of column labels to read
+        filters: optional filters on index level names in the disjunctive
+                 normal form of pyarrow, e.g. [('com', '==', 'Elec')]
+
+    Returns:
+        the DataFrame or Series restricted to columns and filters
+    """
+    manifest = _read_manifest(filename)
+    return _read_columnar(filename, manifest[group][name],
+                          manifest['format'], columns, filters)
 
 
 class ResultContainer(object):
@@ -50,22 +619,250 @@ class ResultContainer(object):
         self._result = result
 
 
-def load(filename):
+class LazyNodes(Mapping):
+    """ Read-only mapping of the frames of one store or directory group.
+
+    Frame names are listed on creation, but each frame is read only when it
+    is accessed first. Loaded frames are kept, optionally in a least
+    recently used cache of bounded size.
+    """
+    def __init__(self, filename, group, cache_size=None, names=None,
+                 where=None):
+        """Lists the frame names of a group without reading them.
+
+        Args:
+            filename: an existing HDF5 store file or result directory
+            group: name of the group, e.g. 'data' or 'result'
+            cache_size: maximum number of loaded frames to keep; if None,
+                all loaded frames are kept
+            names: optional list of frame names to restrict the mapping to
+            where: optional dict of level filters applied when reading,
+                see load
+        """
+        self.filename = filename
+        self.group = group
+        self.cache_size = cache_size
+        self.where = where
+        if os.path.isdir(filename):
+            self._manifest = _read_manifest(filename)
+            self._names = list(self._manifest[group])
+        else:
+            self._manifest = None
+            with pd.HDFStore(filename, mode='r') as store:
+                self._names = [node._v_name
+                               for node in store.get_node(group)]
+        if names is not None:
+            self._names = [name for name in self._names if name in names]
+        self._cache = OrderedDict()
+
+    def __getitem__(self, name):
+        if name in self._cache:
+            self._cache.move_to_end(name)
+            return self._cache[name]
+        if name not in self._names:
+            raise KeyError(name)
+
+        if self._manifest is not None:
+            entry = self._manifest[self.group][name]
+            value = _read_columnar(
+                self.filename, entry, self._manifest['format'],
+                filters=_where_filters(self.where, entry['index']))
+        else:
+            with pd.HDFStore(self.filename, mode='r') as store:
+                value = _get(store, self.group+'/'+name, self.where)
+        if self.cache_size != 0:
+            self._cache[name] = value
+            if (self.cache_size is not None and
+                    len(self._cache) > self.cache_size):
+                self._cache.popitem(last=False)
+        return value
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+def load(filename, lazy=False, cache_size=None, entities=None, where=None):
     """Load a urbs model result container from a HDF5 store file.
 
+    Level filters are pushed down to the storage layer where possible: as
+    where condition for compressed (table format) HDF5 nodes and as filters
+    for Parquet and Feather files. Other nodes are filtered after reading.
+
     Args:
-        filename: an existing HDF5 store file
+        filename: an existing HDF5 store file or a result directory written
+                  with backend 'parquet' or 'feather'
+        lazy: if True, entities are read from the store only on their first
+              access via _data[name] or _result[name]
+        cache_size: for lazy loading, maximum number of loaded frames kept
+                    per group; if None, all loaded frames are kept
+        entities: optional list of entity (and input sheet) names to load
+        where: optional dict of level filters, applied to all frames having
+               that index level; values are a single label, a list of labels
+               or a slice of labels (both ends inclusive), e.g.
+               {'com': 'Elec', 't': slice(1, 168)}
 
     Returns:
         prob: the modified instance containing the result cache
+
+    Example:
+        >>> prob = load('scenario_base.h5', entities=['e_pro_out'],
+        ...             where={'com': 'Elec'})
     """
+    if lazy:
+        return ResultContainer(
+            LazyNodes(filename, 'data', cache_size, entities, where),
+            LazyNodes(filename, 'result', cache_size, entities, where))
+
+    if os.path.isdir(filename):
+        manifest = _read_manifest(filename)
+        caches = [{name: _read_columnar(
+                       filename, entry, manifest['format'],
+                       filters=_where_filters(where, entry['index']))
+                   for name, entry in manifest[group].items()
+                   if entities is None or name in entities}
+                  for group in ['data', 'result']]
+        return ResultContainer(*caches)
+
     with pd.HDFStore(filename, mode='r') as store:
         data_cache = {}
         for group in store.get_node('data'):
-            data_cache[group._v_name] = store[group._v_pathname]
+            if entities is None or group._v_name in entities:
+                data_cache[group._v_name] = _get(
+                    store, group._v_pathname, where)
 
         result_cache = {}
         for group in store.get_node('result'):
-            result_cache[group._v_name] = store[group._v_pathname]
+            if entities is None or group._v_name in entities:
+                result_cache[group._v_name] = _get(
+                    store, group._v_pathname, where)
 
     return ResultContainer(data_cache, result_cache)
+
+
+# result file names of the decomposition methods, e.g.
+# 'master-iteration-3-scenario_base' or "sub(2, 'mid')-scenario_base"
+_RESULT_NAME = re.compile(r"^(?P<kind>master|sub|original)"
+                          r"(?:\((?P<sub>\d+)(?P<realization>[^)]*)\))?"
+                          r"(?:-iteration-(?P<iteration>\d+))?"
+                          r"-(?P<scenario>.+)$")
+RESULT_KEY_NAMES = ['scenario', 'sub', 'realization', 'iteration']
+
+
+def parse_result_name(filename):
+    """Parse scenario, sub, realization and iteration from a result file name.
+
+    Args:
+        filename: path of a result file (or directory) of a decomposition
+                  run, e.g. "sub(2, 'mid')-iteration-3-scenario_ls.h5"
+
+    Returns:
+        tuple (scenario, sub, realization, iteration). sub is the number of
+        the sub problem, or 'master' / 'original' for these problems;
+        realization is None if not part of the name; iteration is 'end' for
+        results written after convergence. Names not following the pattern
+        are returned as scenario, e.g. (scenario_base, None, None, None)
+    """
+    name = os.path.basename(os.path.normpath(filename))
+    for suffix in ['.h5'] + list(_COLUMNAR_FORMATS.values()):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    match = _RESULT_NAME.match(name)
+    if match is None:
+        return name, None, None, None
+
+    if match.group('sub') is not None:
+        sub = int(match.group('sub'))
+    else:
+        sub = match.group('kind')
+    realization = (match.group('realization') or '').strip(" ,'\"-_") or None
+    if match.group('iteration') is not None:
+        iteration = int(match.group('iteration'))
+    elif match.group('kind') == 'original':
+        iteration = None
+    else:
+        iteration = 'end'
+    return match.group('scenario'), sub, realization, iteration
+
+
+def load_many(paths, entities=None, where=None, workers=None, concat=False,
+              key=parse_result_name):
+    """Load several result files, optionally in parallel processes.
+
+    Args:
+        paths: list of HDF5 store files or result directories, e.g. as
+               returned by functions.glob_result_files
+        entities: optional list of entity (and input sheet) names to load
+        where: optional dict of level filters, see load
+        workers: optional number of processes reading files in parallel;
+                 if None, files are read one after another
+        concat: if True, return one frame per entity instead, with the keys
+                as additional leading index levels (see RESULT_KEY_NAMES)
+        key: function deriving the key of a file from its path, default
+             parse_result_name
+
+    Returns:
+        dict of ResultContainers keyed by (scenario, sub, realization,
+        iteration); with concat, a dict of DataFrames or Series keyed by
+        entity name
+    """
+    paths = list(paths)
+    keys = [key(path) for path in paths]
+    if len(set(keys)) < len(keys):
+        raise ValueError('Result file keys are not unique.')
+
+    read = functools.partial(load, entities=entities, where=where)
+    if workers and workers > 1 and len(paths) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            containers = list(pool.map(read, paths))
+    else:
+        containers = [read(path) for path in paths]
+    results = OrderedDict(zip(keys, containers))
+    if not concat:
+        return results
+
+    frames = OrderedDict()
+    for result_key, container in results.items():
+        for cache in [container._result, container._data]:
+            for name, value in cache.items():
+                frames.setdefault(name, OrderedDict()).setdefault(
+                    result_key, value)
+    names = RESULT_KEY_NAMES if key is parse_result_name else None
+    return {name: _concat_with_keys(values, names)
+            for name, values in frames.items()}
+
+
+def _concat_with_keys(values, names=None):
+    """ Concatenate frames, prepending their keys as index levels.
+
+    Unlike pd.concat(keys=...), keys may contain None, e.g. the missing
+    realization of master problems.
+
+    Args:
+        values: dict of DataFrames or Series keyed by (tuple) keys
+        names: optional list of names of the key levels
+
+    Returns:
+        the concatenated DataFrame or Series
+    """
+    keys = [result_key if isinstance(result_key, tuple) else (result_key,)
+            for result_key in values]
+    if names is None:
+        names = [None] * len(keys[0])
+    lengths = [len(value) for value in values.values()]
+
+    result = pd.concat(list(values.values()))
+    arrays = [np.repeat(np.array([result_key[k] for result_key in keys],
+                                 dtype=object), lengths)
+              for k in range(len(names))]
+    arrays.extend(result.index.get_level_values(k)
+                  for k in range(result.index.nlevels))
+    result.index = pd.MultiIndex.from_arrays(
+        arrays, names=list(names) + list(result.index.names))
+    return result
@@ -0,0 +1,141 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from .input import PreparedInput
+
+
+class ScenarioTree(object):
+    """Uncertain supim time series of the SDDP realizations.
+
+    Keeps the base supim time series once, as read-only NumPy array, which
+    forked worker processes share. The supim of a realization is computed
+    only when a problem is created, and only for its own timesteps (see
+    supim), so that many stages and realizations do not each hold a copy of
+    the whole supim frame.
+
+    A realization perturbs the supim columns of one or more commodities by
+    the convex combination of SddpSub.create_uncertainty_supim with a
+    factor between -1 and 1: towards 0 for negative, towards 1 for positive
+    factors. The factor of a commodity is its loading times the factor of
+    the realization, so that the perturbations of several commodities are
+    correlated (equal signs) or anticorrelated (opposite signs).
+
+    Example:
+        >>> tree = ScenarioTree(data['supim'], {'low': -0.1, 'mid': 0, 'high': 0.1},
+        ...                     loadings={'Solar': 1.0, 'Hydro': 0.5})
+        >>> subs = {(t, r): SddpSub(data, range(t, t + 25), supportsteps, scenario_tree=tree, realization=r)
+        ...         for t in supportsteps[1:-1] for r in tree.realizations}
+    """
+    def __init__(self, supim, realizations, loadings=None, probabilities=None):
+        """Initializes the scenario tree from the base supim time series.
+
+        Args:
+            supim: DataFrame of the supim time series as in the read_excel dict
+            realizations: dict of realization names to their factor between -1 and 1, or to a dict of
+                commodities to factors, which overrides the loadings for this realization
+            loadings: optional dict of commodities to loadings, default: {'Wind': 1.0} as SddpSub
+            probabilities: optional dict of realization names to probabilities, default: uniform
+        """
+        self.index = supim.index
+        self.columns = supim.columns
+        self._values = np.array(supim.values, dtype=float)
+        self._values.setflags(write=False)
+
+        self.loadings = OrderedDict(loadings or [('Wind', 1.0)])
+        self.realizations = OrderedDict(realizations)
+        if probabilities is None:
+            probabilities = dict((name, 1.0 / len(self.realizations)) for name in self.realizations)
+        self.probabilities = OrderedDict((name, probabilities[name]) for name in self.realizations)
+        if abs(sum(self.probabilities.values()) - 1) > 1e-6:
+            raise ValueError('The probabilities of the realizations must add up to 1.')
+
+        commodities = self.columns.get_level_values(1)
+        self._columns = dict((com, np.flatnonzero(commodities == com)) for com in set(commodities))
+
+    def factors(self, realization):
+        """Returns the factors of the perturbed commodities of a realization.
+
+        Args:
+            realization: name of the realization
+
+        Returns:
+            dict of commodities to factors between -1 and 1
+        """
+        factor = self.realizations[realization]
+        if isinstance(factor, dict):
+            return dict(factor)
+        return dict((com, float(np.clip(loading * factor, -1, 1))) for com, loading in self.loadings.items())
+
+    def supim(self, realization, timesteps=None):
+        """Returns the supim time series of a realization for the given timesteps only.
+
+        Args:
+            realization: name of the realization
+            timesteps: optional list of timesteps, default: all
+
+        Returns:
+            DataFrame of the perturbed supim time series
+        """
+        if timesteps is None:
+            rows = slice(None)
+        else:
+            rows = self.index.get_indexer(list(timesteps))
+            if (rows < 0).any():
+                raise KeyError('Timesteps not in supim: ' + str(list(np.asarray(timesteps)[rows < 0])))
+        # fancy indexing copies the window only, the base stays read-only
+        values = self._values[rows].copy() if timesteps is None else self._values[rows]
+        for com, factor in self.factors(realization).items():
+            columns = self._columns.get(com)
+            if columns is None or factor == 0:
+                continue
+            values[:, columns] = convex_combination(values[:, columns], factor)
+        return pd.DataFrame(values, index=self.index[rows], columns=self.columns)
+
+    def data(self, data, realization, timesteps=None):
+        """Returns input data with the supim time series of a realization.
+
+        Args:
+            data: dict of pandas DataFrames or PreparedInput with the base data
+            realization: name of the realization
+            timesteps: optional list of timesteps, default: all
+
+        Returns:
+            dict of pandas DataFrames or PreparedInput sharing all other input with data
+        """
+        return with_supim(data, self.supim(realization, timesteps))
+
+
+def convex_combination(supim, factor):
+    """Returns the convex combination of supim with 0 (factor < 0) or 1 (factor > 0).
+
+    Args:
+        supim: pandas or NumPy time series
+        factor: float between -1 and 1
+
+    Returns:
+        the combined time series of the same type
+    """
+    if factor < 0:
+        return (1 - abs(factor)) * supim
+    elif factor > 0:
+        return abs(factor) + (1 - abs(factor)) * supim
+    return supim
+
+
+def with_supim(data, supim):
+    """Returns input data with replaced supim time series.
+
+    Args:
+        data: dict of pandas DataFrames or PreparedInput
+        supim: DataFrame of the new supim time series
+
+    Returns:
+        dict of pandas DataFrames or PreparedInput sharing all other input with data
+    """
+    if isinstance(data, PreparedInput):
+        # keep the shared preprocessing of all other input
+        return data.with_supim(supim)
+    new_data = data.copy()
+    new_data['supim'] = supim
+    return new_data
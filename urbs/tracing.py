@@ -0,0 +1,249 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import psutil
+
+# active Tracer of this process, see start_tracing
+_tracer = None
+
+
+class Tracer(object):
+    """Writes the spans of one process to an event log.
+
+    Every span records its wall time, CPU time, self time (wall time without
+    the nested spans), the resident set size (RSS) and the peak RSS of the
+    process at its end, the current iteration (see set_iteration) and its
+    nesting depth. The log is written one event per line, either as JSON
+    lines ('jsonl') or in the Chrome trace format ('chrome', for
+    chrome://tracing or Perfetto).
+    """
+    def __init__(self, filename, trace_format='jsonl'):
+        if trace_format not in ('jsonl', 'chrome'):
+            raise ValueError("trace_format must be 'jsonl' or 'chrome', not " + repr(trace_format))
+        self.filename = filename
+        self.trace_format = trace_format
+        self.iteration = None
+        self._process = psutil.Process(os.getpid())
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        new = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        self._file = open(filename, 'a')
+        if new and trace_format == 'chrome':
+            # the closing bracket of the JSON array is optional in this format
+            self._write('[')
+
+    def _stack(self):
+        """ Return the list of open spans of the current thread """
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def begin(self):
+        """ Open a span and return its start record """
+        record = [time.time(), time.perf_counter(), time.process_time(), 0.0]
+        self._stack().append(record)
+        return record
+
+    def end(self, name, record, attributes):
+        """ Close the span opened by begin and write its event """
+        wall = time.perf_counter() - record[1]
+        cpu = time.process_time() - record[2]
+        stack = self._stack()
+        stack.pop()
+        if stack:
+            stack[-1][3] += wall
+        if self._process.pid != os.getpid():
+            # forked worker process
+            self._process = psutil.Process(os.getpid())
+        event = {'name': name,
+                 'start': record[0],
+                 'wall': wall,
+                 'cpu': cpu,
+                 'self': wall - record[3],
+                 'rss': self._process.memory_info().rss,
+                 'peak_rss': _peak_rss(self._process),
+                 'iteration': self.iteration,
+                 'depth': len(stack),
+                 'pid': os.getpid()}
+        event.update(attributes)
+        if self.trace_format == 'chrome':
+            event = {'name': name, 'ph': 'X', 'ts': record[0] * 1e6, 'dur': wall * 1e6,
+                     'pid': event.pop('pid'), 'tid': threading.get_ident(), 'args': event}
+            self._write(json.dumps(event, default=str) + ',')
+        else:
+            self._write(json.dumps(event, default=str))
+
+    def _write(self, line):
+        """ Append a line to the log; flushed at once, so that forked worker processes can share the file """
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def start_tracing(filename, trace_format='jsonl'):
+    """Start recording spans of this process to an event log.
+
+    Args:
+        filename: event log file; events are appended
+        trace_format: 'jsonl' (default) or 'chrome'
+
+    Returns:
+        the Tracer
+
+    Example:
+        >>> urbs.start_tracing('trace.jsonl')
+        >>> for i in range(iterations):
+        >>>     urbs.set_iteration(i)
+        >>>     ...
+        >>> urbs.stop_tracing()
+        >>> urbs.summarize_trace('trace.jsonl')
+    """
+    global _tracer
+    stop_tracing()
+    _tracer = Tracer(filename, trace_format)
+    return _tracer
+
+
+def stop_tracing():
+    """Stop recording spans and close the event log."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
+
+
+def set_iteration(iteration):
+    """Set the iteration which is recorded with the following spans.
+
+    Args:
+        iteration: e.g. the Benders iteration number, None outside of loops
+    """
+    if _tracer is not None:
+        _tracer.iteration = iteration
+
+
+@contextmanager
+def span(name, **attributes):
+    """Record the code in a with block as span, if tracing is active.
+
+    Args:
+        name: name of the span, e.g. 'solve'
+        attributes: further values recorded with the event
+
+    Example:
+        >>> with span('preprocessing', scenario='base'):
+        >>>     data = scenario(data)
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+    record = tracer.begin()
+    try:
+        yield
+    finally:
+        tracer.end(name, record, attributes)
+
+
+def traced(name):
+    """Decorator recording each call of a function as span name.
+
+    If the first argument has a string attribute 'name' (e.g. a urbs
+    problem), it is recorded as attribute 'problem'.
+
+    Args:
+        name: name of the span
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            attributes = {}
+            problem = getattr(args[0], 'name', None) if args else None
+            if isinstance(problem, str):
+                attributes['problem'] = problem
+            record = tracer.begin()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tracer.end(name, record, attributes)
+        return wrapper
+    return decorator
+
+
+def read_trace(filename):
+    """Read an event log written by start_tracing.
+
+    Args:
+        filename: event log in JSON lines or Chrome trace format
+
+    Returns:
+        DataFrame with one row per span
+    """
+    events = []
+    with open(filename) as trace_file:
+        for line in trace_file:
+            line = line.strip().rstrip(',')
+            if line in ('', '[', ']'):
+                continue
+            event = json.loads(line)
+            if 'args' in event:
+                event = dict(event['args'], pid=event['pid'])
+            events.append(event)
+    frame = pd.DataFrame(events)
+    if 'iteration' in frame:
+        # keep integer iterations next to spans outside of iterations
+        frame['iteration'] = pd.Series([event.get('iteration') for event in events], dtype=object)
+    return frame
+
+
+def summarize_trace(filename, value='self'):
+    """Summarize where the time of each iteration went.
+
+    Args:
+        filename: event log in JSON lines or Chrome trace format
+        value: 'self' (default, wall time without nested spans, so that the
+               columns add up to the total), 'wall' or 'cpu'
+
+    Returns:
+        DataFrame of the summed times in seconds with one row per iteration
+        (spans outside of iterations in row 'none') and one column per span
+        name, sorted by total time, plus the column 'total' and the maximal
+        'peak_rss' in bytes
+    """
+    events = read_trace(filename)
+    if events.empty:
+        return pd.DataFrame()
+    events['iteration'] = events['iteration'].astype(object).where(events['iteration'].notnull(), 'none')
+    summary = events.groupby(['iteration', 'name'], sort=False)[value].sum().unstack(fill_value=0.0)
+    summary = summary[summary.sum().sort_values(ascending=False).index]
+    summary.columns.name = None
+    summary['total'] = summary.sum(axis=1)
+    summary['peak_rss'] = events.groupby('iteration')['peak_rss'].max()
+    return summary
+
+
+def _peak_rss(process):
+    """ Return the peak resident set size of process in bytes, None if unknown """
+    memory = process.memory_info()
+    if hasattr(memory, 'peak_wset'):
+        # Windows
+        return memory.peak_wset
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -2,7 +2,9 @@ def validate_input(data):
     """ Input validation function
 
     This function raises errors if inconsistent or illogical inputs are
-    made, that might lead to erreneous results.
+    made, that might lead to erreneous results. Every check works on whole
+    sheets at once and all violations are collected, so that one error
+    message lists every offending row of the input file.
 
     Args:
         data: Input data frames as read in by input.read_excel
@@ -11,55 +13,75 @@ def validate_input(data):
         Customized error messages.
 
     """
+    errors = []
 
     # Ensure correct formation of vertex rule
-    for (sit, pro) in data['process'].index:
-        for com in data['commodity'].index.get_level_values('Commodity'):
-            simplified_pro_com_index = ([(p, c) for p, c, d in
-                                        data['process_commodity'].index
-                                        .tolist()])
-            simplified_com_index = ([(s, c) for s, c, t in data['commodity']
-                                    .index.tolist()])
-            if ((pro, com) in simplified_pro_com_index and
-                (sit, com) not in simplified_com_index):
-                raise ValueError('Commodities used in a process at a site must'
-                                 ' be specified in the commodity input sheet'
-                                 '! The pair (' + sit + ',' + com + ')'
-                                 ' is not in commodity input sheet.')
+    # all (site, commodity) pairs used by a process at a site must be
+    # specified in the commodity input sheet
+    used = (data['process'].index.to_frame(index=False)[['Site', 'Process']]
+            .merge(data['process_commodity'].index
+                   .to_frame(index=False)[['Process', 'Commodity']],
+                   on='Process'))
+    used = set(zip(used['Site'], used['Commodity']))
+    defined = set(zip(
+        data['commodity'].index.get_level_values('Site'),
+        data['commodity'].index.get_level_values('Commodity')))
+    known = set(data['commodity'].index.get_level_values('Commodity'))
+    missing = sorted(pair for pair in used - defined if pair[1] in known)
+    if missing:
+        errors.append('Commodities used in a process at a site must be '
+                      'specified in the commodity input sheet! The pairs ' +
+                      _format_rows(missing) +
+                      ' are not in commodity input sheet.')
 
     # Identify infeasible process, transmission and storage capacity
     # constraints before solving
-    for index in data['process'].index:
-        if not (data['process'].loc[index]['cap-lo'] <=
-                data['process'].loc[index]['cap-up'] and
-                data['process'].loc[index]['inst-cap'] <=
-                data['process'].loc[index]['cap-up']):
-            raise ValueError('Ensure cap_lo <= cap_up and inst_cap <= cap_up'
-                             ' for all processes.')
+    checks = [('process', 'cap-lo', 'cap-up', 'inst-cap', 'processes'),
+              ('transmission', 'cap-lo', 'cap-up', 'inst-cap',
+               'transmissions'),
+              ('storage', 'cap-lo-p', 'cap-up-p', 'inst-cap-p',
+               'storage powers'),
+              ('storage', 'cap-lo-c', 'cap-up-c', 'inst-cap-c',
+               'storage capacities')]
+    for sheet, cap_lo, cap_up, inst_cap, description in checks:
+        violations = _infeasible_capacity_bounds(
+            data[sheet], cap_lo, cap_up, inst_cap)
+        if len(violations) > 0:
+            errors.append('Ensure cap_lo <= cap_up and inst_cap <= cap_up'
+                          ' for all ' + description + '. Violated by: ' +
+                          _format_rows(violations) + '.')
 
-    for index in data['transmission'].index:
-        if not (data['transmission'].loc[index]['cap-lo'] <=
-                data['transmission'].loc[index]['cap-up'] and
-                data['transmission'].loc[index]['inst-cap'] <=
-                data['transmission'].loc[index]['cap-up']):
-            raise ValueError('Ensure cap_lo <= cap_up and inst_cap <= cap_up'
-                             ' for all transmissions.')
+    # Identify SupIm values larger than 1, which lead to an infeasible model
+    supim_violations = (data['supim'] > 1).any(axis=0)
+    supim_violations = supim_violations[supim_violations].index
+    if len(supim_violations) > 0:
+        errors.append('All values in Sheet SupIm must be <= 1. Violated by: ' +
+                      _format_rows(supim_violations) + '.')
 
-    for index in data['storage'].index:
-        if not (data['storage'].loc[index]['cap-lo-p'] <=
-                data['storage'].loc[index]['cap-up-p'] and
-                data['storage'].loc[index]['inst-cap-p'] <=
-                data['storage'].loc[index]['cap-up-p']):
-            raise ValueError('Ensure cap_lo <= cap_up and inst_cap <= cap_up'
-                             ' for all storage powers.')
+    if errors:
+        raise ValueError('\n'.join(errors))
 
-        elif not (data['storage'].loc[index]['cap-lo-c'] <=
-                  data['storage'].loc[index]['cap-up-c'] and
-                  data['storage'].loc[index]['inst-cap-c'] <=
-                  data['storage'].loc[index]['cap-up-c']):
-            raise ValueError('Ensure cap_lo <= cap_up and inst_cap <= cap_up'
-                             ' for all storage capacities.')
 
-    # Identify SupIm values larger than 1, which lead to an infeasible model
-    if (data['supim'] > 1).sum().sum() > 0:
-        raise ValueError('All values in Sheet SupIm must be <= 1.')
+def _infeasible_capacity_bounds(df, cap_lo, cap_up, inst_cap):
+    """ Return index of rows with inconsistent capacity bounds
+
+    Args:
+        df: process, transmission or storage DataFrame
+        cap_lo: column name of the lower capacity bound
+        cap_up: column name of the upper capacity bound
+        inst_cap: column name of the installed capacity
+
+    Returns:
+        index of all rows violating cap_lo <= cap_up and inst_cap <= cap_up;
+        rows with missing values count as violations
+    """
+    feasible = (df[cap_lo] <= df[cap_up]) & (df[inst_cap] <= df[cap_up])
+    return df.index[~feasible]
+
+
+def _format_rows(rows):
+    """ Format index labels as comma separated '(a,b)' string for messages """
+    return ', '.join(
+        '(' + ','.join(str(label) for label in row) + ')'
+        if isinstance(row, tuple) else '(' + str(row) + ')'
+        for row in rows)